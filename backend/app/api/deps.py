@@ -1,17 +1,46 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
-from app.core.security import decode_token
+from app.core.cache import user_cache
+from app.core.revocation import revoked_tokens
+from app.core.security import decode_token, token_id
 from app.core.database import get_database
-from app.models.user import User
+from app.core.singleflight import flight_group
+from app.core.token_versions import token_versions
+from app.models.user import Principal, User
 from bson import ObjectId
 
 security = HTTPBearer()
 
+# Concurrent requests from the same user share one lookup
+user_flight = flight_group("users")
+
+async def load_user(db, user_id: str) -> Optional[User]:
+    """Read a user document and build its model"""
+    user_data = await db.users.find_one({"_id": ObjectId(user_id)})
+    if user_data is None:
+        return None
+    return User(**{**user_data, "_id": str(user_data["_id"])})
+
+async def cached_user(db, user_id: str) -> Optional[User]:
+    """Return a user from the principal cache, reading it on a miss"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    # Concurrent misses share a read only at the same version, so a read
+    # started before a write is never stored under the newer version
+    version = user_cache.version(user_id)
+    user = await user_flight.do((user_id, version), lambda: load_user(db, user_id))
+    if user is not None:
+        user_cache.set(user_id, user, version)
+    return user
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db = Depends(get_database)
-) -> User:
+) -> Principal:
     """Get current authenticated user"""
     token = credentials.credentials
     
@@ -24,7 +53,7 @@ async def get_current_user(
             )
         
         user_id = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("type") != "access":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
@@ -35,20 +64,35 @@ async def get_current_user(
             detail="Could not validate credentials"
         )
     
-    # Get user from database
-    user_data = await db.users.find_one({"_id": ObjectId(user_id)})
-    if user_data is None:
+    # Tokens revoked by logout; the Bloom filter answers without a query
+    # unless the token may have been revoked
+    if await revoked_tokens.is_revoked(db, token_id(token)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    
+    # Tokens with embedded claims are authorized without a database lookup
+    if "ver" in payload:
+        if not token_versions.is_current(user_id, payload["ver"]):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+        return Principal(id=user_id, is_active=payload.get("active", True), is_admin=payload.get("admin", False))
+    
+    # Tokens issued before claims were embedded
+    user = await cached_user(db, user_id)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    
-    user_data["id"] = str(user_data["_id"])
-    return User(**user_data)
+    return Principal(id=user.id, is_active=user.is_active, is_admin=user.is_admin)
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(
@@ -58,8 +102,8 @@ async def get_current_active_user(
     return current_user
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
     """Get current admin user"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -67,3 +111,16 @@ async def get_current_admin_user(
             detail="Not enough permissions"
         )
     return current_user
+
+async def get_current_profile(
+    current_user: Principal = Depends(get_current_active_user),
+    db = Depends(get_database)
+) -> User:
+    """Get the full user document of the current active user"""
+    user = await cached_user(db, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
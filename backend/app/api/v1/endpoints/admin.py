@@ -1,13 +1,23 @@
 from fastapi import APIRouter, HTTPException, status, Query, Depends
 from datetime import datetime
 from bson import ObjectId
-import math
+from typing import Optional
+import asyncio
 from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
 from app.schemas.order import OrderList, OrderResponse, OrderStatus
-from app.schemas.user import UserList, UserResponse
+from app.schemas.user import UserList, UserResponse, UserStatusUpdate
 from app.api.deps import get_current_admin_user
+from app.core.cache import catalog_version, facet_cache, page_cache, product_cache, user_cache
+from app.core.singleflight import flight_groups
 from app.core.database import get_database
-from app.models.user import User
+from app.core.invalidation import PRODUCT_TOMBSTONE_TTL, record_deletion
+from app.core.search import index_product, unindex_product
+from app.core.security import password_hasher, token_cache
+from app.core.serialization import ORJSONResponse, trusted, trusted_list
+from app.core.revocation import revoked_tokens
+from app.core.token_versions import delete_user_tokens, revoke_user_tokens, token_versions
+from app.core.pagination import count_cache, COUNT_MODES, apply_cursor, count_documents, next_cursor, page_count
+from app.models.user import Principal
 
 router = APIRouter()
 
@@ -15,7 +25,7 @@ router = APIRouter()
 @router.post("/products", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product: ProductCreate,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Create a new product (Admin only)"""
@@ -25,6 +35,9 @@ async def create_product(
     
     result = await db.products.insert_one(new_product)
     new_product["id"] = str(result.inserted_id)
+    index_product(new_product)
+    product_cache.bump(new_product["id"])
+    catalog_version.bump()
     
     return ProductResponse(**new_product)
 
@@ -32,7 +45,7 @@ async def create_product(
 async def update_product(
     product_id: str,
     product_update: ProductUpdate,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Update a product (Admin only)"""
@@ -61,17 +74,20 @@ async def update_product(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
+    product_cache.bump(product_id)
+    catalog_version.bump()
     
     # Get updated product
     updated_product = await db.products.find_one({"_id": ObjectId(product_id)})
     updated_product["id"] = str(updated_product["_id"])
+    index_product(updated_product)
     
     return ProductResponse(**updated_product)
 
 @router.delete("/products/{product_id}")
 async def delete_product(
     product_id: str,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Delete a product (Admin only)"""
@@ -89,6 +105,11 @@ async def delete_product(
             detail="Product not found"
         )
     
+    await record_deletion(db, "products", product_id, PRODUCT_TOMBSTONE_TTL)
+    unindex_product(product_id)
+    product_cache.bump(product_id)
+    catalog_version.bump()
+    
     return {"message": "Product deleted successfully"}
 
 # Order Management
@@ -97,7 +118,9 @@ async def get_all_orders(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     order_status: OrderStatus = None,
-    current_user: User = Depends(get_current_admin_user),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex=COUNT_MODES),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Get all orders (Admin only)"""
@@ -105,33 +128,30 @@ async def get_all_orders(
     if order_status:
         query_filter["status"] = order_status
     
-    # Get total count
-    total = await db.orders.count_documents(query_filter)
-    
     # Calculate pagination
-    skip = (page - 1) * limit
-    pages = math.ceil(total / limit)
-    
-    # Get orders
-    cursor = db.orders.find(query_filter).sort("created_at", -1).skip(skip).limit(limit)
-    orders = await cursor.to_list(length=limit)
+    skip = 0 if cursor else (page - 1) * limit
     
-    # Convert ObjectId to string
-    for order in orders:
-        order["id"] = str(order["_id"])
-    
-    return OrderList(
-        orders=[OrderResponse(**o) for o in orders],
-        total=total,
-        page=page,
-        pages=pages
+    # Get orders and total count concurrently
+    total, orders = await asyncio.gather(
+        count_documents(db.orders, query_filter, count),
+        db.orders.find(
+            apply_cursor(query_filter, cursor, "created_at", -1)
+        ).sort([("created_at", -1), ("_id", -1)]).skip(skip).limit(limit).to_list(length=limit)
     )
+    
+    return ORJSONResponse({
+        "orders": trusted_list(OrderResponse, orders),
+        "total": total,
+        "page": page,
+        "pages": page_count(total, limit),
+        "next_cursor": next_cursor(orders, limit, "created_at")
+    })
 
 @router.put("/orders/{order_id}/status")
 async def update_order_status(
     order_id: str,
     new_status: OrderStatus,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Update order status (Admin only)"""
@@ -159,37 +179,36 @@ async def update_order_status(
 async def get_all_users(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_admin_user),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex=COUNT_MODES),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Get all users (Admin only)"""
-    # Get total count
-    total = await db.users.count_documents({})
-    
     # Calculate pagination
-    skip = (page - 1) * limit
-    pages = math.ceil(total / limit)
-    
-    # Get users
-    cursor = db.users.find({}).sort("created_at", -1).skip(skip).limit(limit)
-    users = await cursor.to_list(length=limit)
-    
-    # Convert ObjectId to string and remove password
-    for user in users:
-        user["id"] = str(user["_id"])
-        user.pop("hashed_password", None)
+    skip = 0 if cursor else (page - 1) * limit
     
-    return UserList(
-        users=[UserResponse(**u) for u in users],
-        total=total,
-        page=page,
-        pages=pages
+    # Get users and total count concurrently
+    total, users = await asyncio.gather(
+        count_documents(db.users, {}, count),
+        db.users.find(
+            apply_cursor({}, cursor, "created_at", -1)
+        ).sort([("created_at", -1), ("_id", -1)]).skip(skip).limit(limit).to_list(length=limit)
     )
+    
+    # Only UserResponse fields are copied, so hashed_password is dropped
+    return ORJSONResponse({
+        "users": trusted_list(UserResponse, users),
+        "total": total,
+        "page": page,
+        "pages": page_count(total, limit),
+        "next_cursor": next_cursor(users, limit, "created_at")
+    })
 
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: str,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Delete a user (Admin only)"""
@@ -213,16 +232,55 @@ async def delete_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    await delete_user_tokens(db, user_id)
     
     # Also delete user's cart and orders (optional, depending on business logic)
     await db.carts.delete_many({"user_id": user_id})
     
     return {"message": "User deleted successfully"}
 
+@router.put("/users/{user_id}/status", response_model=UserResponse)
+async def update_user_status(
+    user_id: str,
+    status_update: UserStatusUpdate,
+    current_user: Principal = Depends(get_current_admin_user),
+    db = Depends(get_database)
+):
+    """Activate, deactivate, promote or demote a user (Admin only)"""
+    changes = status_update.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+    
+    # Prevent locking yourself out
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot change your own status"
+        )
+    
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid user ID"
+        )
+    
+    # Tokens carry is_active/is_admin, so every token issued before the change is revoked
+    user = await revoke_user_tokens(db, user_id, changes)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    return ORJSONResponse(trusted(UserResponse, user))
+
 # Analytics
 @router.get("/analytics/dashboard")
 async def get_dashboard_analytics(
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db = Depends(get_database)
 ):
     """Get dashboard analytics (Admin only)"""
@@ -269,3 +327,25 @@ async def get_dashboard_analytics(
             for p in low_stock_products
         ]
     }
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: Principal = Depends(get_current_admin_user)):
+    """Get in-process cache hit/miss counters (Admin only)"""
+    return {
+        "product": product_cache.stats(),
+        "facets": facet_cache.stats(),
+        "counts": count_cache.stats(),
+        "pages": page_cache.stats(),
+        "single_flight": {name: group.stats() for name, group in flight_groups.items()}
+    }
+
+@router.get("/auth/stats")
+async def get_auth_stats(current_user: Principal = Depends(get_current_admin_user)):
+    """Get password hashing, token cache and revocation counters (Admin only)"""
+    return {
+        "password_hashing": password_hasher.stats(),
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+        "token_versions": token_versions.stats(),
+        "revoked_tokens": revoked_tokens.stats()
+    }
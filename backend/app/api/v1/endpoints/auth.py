@@ -1,16 +1,24 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from datetime import datetime
 from bson import ObjectId
 from app.schemas.auth import LoginRequest, LoginResponse, RegisterRequest, TokenRefresh
 from app.schemas.user import UserResponse
 from app.core.database import get_database
 from app.core.security import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
     create_access_token, 
     create_refresh_token,
-    decode_token
+    decode_token,
+    principal_claims,
+    token_id
 )
+from app.core.revocation import revoked_tokens
+from app.core.token_versions import revoke_user_tokens
+from app.api.deps import get_current_user, security
+from app.models.user import Principal
 
 router = APIRouter()
 
@@ -28,7 +36,7 @@ async def register(user_data: RegisterRequest, db = Depends(get_database)):
     # Create new user
     new_user = {
         "email": user_data.email,
-        "hashed_password": get_password_hash(user_data.password),
+        "hashed_password": await get_password_hash_async(user_data.password),
         "first_name": user_data.first_name,
         "last_name": user_data.last_name,
         "phone": user_data.phone,
@@ -55,7 +63,7 @@ async def login(credentials: LoginRequest, db = Depends(get_database)):
         )
     
     # Verify password
-    if not verify_password(credentials.password, user["hashed_password"]):
+    if not await verify_password_async(credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -70,8 +78,8 @@ async def login(credentials: LoginRequest, db = Depends(get_database)):
     
     # Create tokens
     user_id = str(user["_id"])
-    access_token = create_access_token(data={"sub": user_id})
-    refresh_token = create_refresh_token(data={"sub": user_id})
+    access_token = create_access_token(data=principal_claims(user))
+    refresh_token = create_refresh_token(data={"sub": user_id, "ver": user.get("token_version", 0)})
     
     return LoginResponse(
         access_token=access_token,
@@ -102,6 +110,12 @@ async def refresh_token(token_data: TokenRefresh, db = Depends(get_database)):
             detail="Invalid refresh token"
         )
     
+    if await revoked_tokens.is_revoked(db, token_id(token_data.refresh_token)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked"
+        )
+    
     # Verify user still exists
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
@@ -110,9 +124,16 @@ async def refresh_token(token_data: TokenRefresh, db = Depends(get_database)):
             detail="User not found"
         )
     
+    # Tokens issued before a logout or password reset are revoked
+    if payload.get("ver", 0) != user.get("token_version", 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked"
+        )
+    
     # Create new tokens
-    access_token = create_access_token(data={"sub": user_id})
-    new_refresh_token = create_refresh_token(data={"sub": user_id})
+    access_token = create_access_token(data=principal_claims(user))
+    new_refresh_token = create_refresh_token(data={"sub": user_id, "ver": user.get("token_version", 0)})
     
     return LoginResponse(
         access_token=access_token,
@@ -127,9 +148,35 @@ async def refresh_token(token_data: TokenRefresh, db = Depends(get_database)):
     )
 
 @router.post("/logout")
-async def logout():
-    """User logout"""
-    # In a production app, you would add the token to a blacklist here
+async def logout(
+    token_data: Optional[TokenRefresh] = None,
+    all_sessions: bool = False,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: Principal = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """User logout, revoking this session's tokens, or every token with all_sessions"""
+    if all_sessions:
+        await revoke_user_tokens(db, current_user.id)
+        return {"message": "Logged out successfully"}
+    
+    refresh_payload = None
+    if token_data is not None:
+        refresh_payload = decode_token(token_data.refresh_token)
+        if (
+            refresh_payload is None
+            or refresh_payload.get("type") != "refresh"
+            or refresh_payload.get("sub") != current_user.id
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid refresh token"
+            )
+    
+    access_token = credentials.credentials
+    await revoked_tokens.revoke(db, token_id(access_token), decode_token(access_token))
+    if refresh_payload is not None:
+        await revoked_tokens.revoke(db, token_id(token_data.refresh_token), refresh_payload)
     return {"message": "Logged out successfully"}
 
 @router.post("/forgot-password")
@@ -162,13 +209,10 @@ async def reset_password(token: str, new_password: str, db = Depends(get_databas
         )
     
     # Update password
-    hashed_password = get_password_hash(new_password)
-    result = await db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"hashed_password": hashed_password, "updated_at": datetime.utcnow()}}
-    )
+    hashed_password = await get_password_hash_async(new_password)
+    user = await revoke_user_tokens(db, user_id, {"hashed_password": hashed_password})
     
-    if result.modified_count == 0:
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
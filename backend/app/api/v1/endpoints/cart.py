@@ -1,17 +1,43 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from datetime import datetime
+from typing import Dict, List, Optional, Union
 from bson import ObjectId
-from typing import List
-from app.schemas.cart import CartResponse, CartItemAdd, CartItemUpdate, CartItem
+from pymongo import ReturnDocument
+from app.schemas.cart import (
+    CartResponse,
+    CartItemAdd,
+    CartItemUpdate,
+    CartItem,
+    CartDelta,
+    CartSummary,
+    CartBatchAdd
+)
 from app.api.deps import get_current_active_user
 from app.core.database import get_database
-from app.models.user import User
+from app.core.loaders import ProductLoader
+from app.models.user import Principal
 
 router = APIRouter()
 
-async def get_cart_with_details(user_id: str, db):
+# response= modes for cart mutations
+RESPONSE_MODES = "^(full|delta)$"
+
+def cart_line(item: dict, product: dict) -> CartItem:
+    """Render a cart line with the product's current details"""
+    return CartItem(
+        id=str(item["product_id"]),
+        product_id=str(item["product_id"]),
+        product_name=product["name"],
+        product_price=product["price"],
+        product_image=product["images"][0] if product.get("images") else "",
+        quantity=item["quantity"],
+        subtotal=product["price"] * item["quantity"]
+    )
+
+async def get_cart_with_details(user_id: str, db, loader: ProductLoader = None, cart: dict = None):
     """Helper function to get cart with product details"""
-    cart = await db.carts.find_one({"user_id": user_id})
+    if cart is None:
+        cart = await db.carts.find_one({"user_id": user_id})
     
     if not cart:
         # Create new cart
@@ -26,20 +52,16 @@ async def get_cart_with_details(user_id: str, db):
     cart_items = []
     total = 0.0
     
+    # Resolve every product in the cart with a single query
+    loader = loader or ProductLoader(db)
+    products = await loader.load_many(item["product_id"] for item in cart.get("items", []))
+    
     for item in cart.get("items", []):
-        product = await db.products.find_one({"_id": ObjectId(item["product_id"])})
+        product = products.get(item["product_id"])
         if product:
-            subtotal = product["price"] * item["quantity"]
-            cart_items.append(CartItem(
-                id=str(item["product_id"]),
-                product_id=str(item["product_id"]),
-                product_name=product["name"],
-                product_price=product["price"],
-                product_image=product["images"][0] if product["images"] else "",
-                quantity=item["quantity"],
-                subtotal=subtotal
-            ))
-            total += subtotal
+            line = cart_line(item, product)
+            cart_items.append(line)
+            total += line.subtotal
     
     return CartResponse(
         user_id=user_id,
@@ -49,24 +71,212 @@ async def get_cart_with_details(user_id: str, db):
         updated_at=cart.get("updated_at", datetime.utcnow())
     )
 
+# Pipeline stage recomputing the stored totals from the lines in the same
+# write that changed them; lines are totalled at their stored price
+CART_TOTALS = {"$set": {
+    "item_count": {"$size": "$items"},
+    "total": {"$sum": {"$map": {
+        "input": "$items",
+        "as": "line",
+        "in": {"$multiply": [{"$ifNull": ["$$line.price", 0]}, "$$line.quantity"]}
+    }}}
+}}
+
+def cart_update(items: dict) -> list:
+    """Pipeline update replacing the lines, bumping version and recomputing totals"""
+    return [
+        {"$set": {
+            "items": items,
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+            "updated_at": datetime.utcnow()
+        }},
+        CART_TOTALS
+    ]
+
+def update_line(product_id: str, changes: dict) -> dict:
+    """Expression applying changes to one product's line"""
+    return {"$map": {
+        "input": {"$ifNull": ["$items", []]},
+        "as": "line",
+        "in": {"$cond": [
+            {"$eq": ["$$line.product_id", {"$literal": product_id}]},
+            {"$mergeObjects": ["$$line", changes]},
+            "$$line"
+        ]}
+    }}
+
+def cart_summary(cart: dict) -> CartSummary:
+    """Return the totals stored on a cart"""
+    return CartSummary(item_count=cart["item_count"], total=cart["total"], updated_at=cart.get("updated_at"))
+
+async def backfill_cart_totals(db, cart: dict, loader: ProductLoader = None) -> CartSummary:
+    """Price lines and store totals for a cart last written before they were kept
+    
+    Unpriced lines take the product's current price. Every mutation bumps
+    version, so the backfill is dropped if another write got there first.
+    """
+    items = cart.get("items", [])
+    unpriced = [item["product_id"] for item in items if "price" not in item]
+    products = await (loader or ProductLoader(db)).load_many(unpriced) if unpriced else {}
+    items = [
+        {**item, "price": products.get(item["product_id"], {}).get("price", 0.0)} if "price" not in item else item
+        for item in items
+    ]
+    
+    summary = CartSummary(
+        item_count=len(items),
+        total=sum(item["price"] * item["quantity"] for item in items),
+        updated_at=cart.get("updated_at")
+    )
+    await db.carts.update_one(
+        {"_id": cart["_id"], "version": cart.get("version")},
+        {"$set": {"items": items, "item_count": summary.item_count, "total": summary.total}}
+    )
+    return summary
+
+async def mutation_summary(db, cart: dict, loader: ProductLoader = None) -> CartSummary:
+    """Return a mutated cart's totals, backfilling lines written before prices were kept"""
+    if any("price" not in item for item in cart.get("items", [])):
+        return await backfill_cart_totals(db, cart, loader)
+    return cart_summary(cart)
+
+def cart_delta(product_id: str, cart: dict, product: Optional[dict], summary: CartSummary) -> CartDelta:
+    """Describe the changed line and the new totals without reloading the cart"""
+    item = next((i for i in cart.get("items", []) if i["product_id"] == product_id), None)
+    return CartDelta(
+        product_id=product_id,
+        item=cart_line(item, product) if item and product else None,
+        item_count=summary.item_count,
+        total=summary.total,
+        updated_at=summary.updated_at
+    )
+
+async def create_empty_cart(db, user_id: str):
+    """Create the user's cart if there is none, leaving an existing one untouched"""
+    now = datetime.utcnow()
+    await db.carts.update_one(
+        {"user_id": user_id},
+        {"$setOnInsert": {
+            "items": [], "item_count": 0, "total": 0.0, "version": 0, "created_at": now, "updated_at": now
+        }},
+        upsert=True
+    )
+
+def batch_lookup(product_ids: list, values: list) -> dict:
+    """Expression picking the value for $$line's product from parallel literal arrays"""
+    return {"$arrayElemAt": [
+        {"$literal": values},
+        {"$indexOfArray": [{"$literal": product_ids}, "$$line.product_id"]}
+    ]}
+
+async def add_cart_items(db, user_id: str, quantities: Dict[str, int], products: Dict[str, dict]) -> Optional[dict]:
+    """Atomically add many lines to a cart in one pipeline update
+    
+    Existing lines are incremented and new lines appended in the same
+    write, which only applies while every resulting quantity stays within
+    stock. Returns the updated cart, or None when some line would exceed stock.
+    The guarded write never upserts, so a failed guard cannot create a
+    second cart for the user.
+    """
+    product_ids = list(quantities)
+    ids = {"$literal": product_ids}
+    added = [quantities[i] for i in product_ids]
+    prices = [products[i]["price"] for i in product_ids]
+    stocks = [products[i]["stock"] for i in product_ids]
+    lines = {"$ifNull": ["$items", []]}
+    
+    over_stock = {"$filter": {
+        "input": lines,
+        "as": "line",
+        "cond": {"$and": [
+            {"$in": ["$$line.product_id", ids]},
+            {"$gt": [{"$add": ["$$line.quantity", batch_lookup(product_ids, added)]}, batch_lookup(product_ids, stocks)]}
+        ]}
+    }}
+    
+    new_lines = [
+        {"product_id": i, "quantity": quantities[i], "price": products[i]["price"]}
+        for i in product_ids
+    ]
+    update = cart_update({"$concatArrays": [
+        {"$map": {
+            "input": lines,
+            "as": "line",
+            "in": {"$cond": [
+                {"$in": ["$$line.product_id", ids]},
+                {"$mergeObjects": ["$$line", {
+                    "quantity": {"$add": ["$$line.quantity", batch_lookup(product_ids, added)]},
+                    "price": batch_lookup(product_ids, prices)
+                }]},
+                "$$line"
+            ]}
+        }},
+        {"$filter": {
+            "input": {"$literal": new_lines},
+            "as": "new",
+            "cond": {"$not": [{"$in": ["$$new.product_id", {"$ifNull": ["$items.product_id", []]}]}]}
+        }}
+    ]})
+    
+    for _ in range(2):
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id, "$expr": {"$eq": [{"$size": over_stock}, 0]}},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        # A miss on an existing cart means some line would exceed stock
+        if cart or await db.carts.find_one({"user_id": user_id}, {"_id": 1}):
+            return cart
+        await create_empty_cart(db, user_id)
+    return None
+
 @router.get("/", response_model=CartResponse)
 async def get_cart(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Get user's shopping cart"""
     return await get_cart_with_details(str(current_user.id), db)
 
-@router.post("/items", response_model=CartResponse)
+@router.get("/summary", response_model=CartSummary)
+async def get_cart_summary(
+    current_user: Principal = Depends(get_current_active_user),
+    db = Depends(get_database)
+):
+    """Get the cart's line count and total from the stored totals
+    
+    Totals are kept by the same write that changes the cart and use each
+    line's price as of when it was last added or updated, so after a price
+    change they can differ from GET /cart, which prices lines live.
+    """
+    cart = await db.carts.find_one(
+        {"user_id": str(current_user.id)},
+        {"item_count": 1, "total": 1, "updated_at": 1, "items.price": 1}
+    )
+    if not cart:
+        return CartSummary(item_count=0, total=0.0)
+    if "total" not in cart or any("price" not in item for item in cart.get("items", [])):
+        # Carts last written before prices and totals were stored
+        cart = await db.carts.find_one({"_id": cart["_id"]})
+        return await backfill_cart_totals(db, cart)
+    return cart_summary(cart)
+
+@router.post("/items", response_model=Union[CartResponse, CartDelta])
 async def add_to_cart(
     item: CartItemAdd,
-    current_user: User = Depends(get_current_active_user),
+    response: str = Query("full", regex=RESPONSE_MODES),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
-    """Add item to cart"""
+    """Add item to cart
+    
+    response=delta returns only the changed line and the new totals.
+    """
+    loader = ProductLoader(db)
+    
     # Verify product exists and has stock
     try:
-        product = await db.products.find_one({"_id": ObjectId(item.product_id)})
+        product = await loader.load(item.product_id)
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -86,103 +296,144 @@ async def add_to_cart(
         )
     
     user_id = str(current_user.id)
-    cart = await db.carts.find_one({"user_id": user_id})
-    
-    if not cart:
-        cart = {
-            "user_id": user_id,
-            "items": [],
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        await db.carts.insert_one(cart)
-    
-    # Check if item already in cart
-    items = cart.get("items", [])
-    existing_item = next((i for i in items if i["product_id"] == item.product_id), None)
-    
-    if existing_item:
-        # Update quantity
-        new_quantity = existing_item["quantity"] + item.quantity
-        if product["stock"] < new_quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient stock"
-            )
-        existing_item["quantity"] = new_quantity
-    else:
-        # Add new item
-        items.append({
-            "product_id": item.product_id,
-            "quantity": item.quantity
-        })
-    
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": items, "updated_at": datetime.utcnow()}}
-    )
+    # Increment or append in one guarded write, as a batch of one line
+    cart = await add_cart_items(db, user_id, {item.product_id: item.quantity}, {item.product_id: product})
+    if cart is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient stock"
+        )
     
-    return await get_cart_with_details(user_id, db)
+    summary = await mutation_summary(db, cart, loader)
+    if response == "delta":
+        return cart_delta(item.product_id, cart, product, summary)
+    return await get_cart_with_details(user_id, db, loader=loader, cart=cart)
 
-@router.put("/items/{item_id}", response_model=CartResponse)
-async def update_cart_item(
-    item_id: str,
-    item_update: CartItemUpdate,
-    current_user: User = Depends(get_current_active_user),
+@router.post("/items:batch", response_model=CartResponse)
+async def add_to_cart_batch(
+    batch: CartBatchAdd,
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
-    """Update cart item quantity"""
-    user_id = str(current_user.id)
-    cart = await db.carts.find_one({"user_id": user_id})
+    """Add many items to the cart at once
     
-    if not cart:
+    Stock for every product is checked with one query and all lines are
+    applied in one atomic cart update; nothing is added if any line fails.
+    """
+    quantities: Dict[str, int] = {}
+    for item in batch.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    
+    invalid = [i for i in quantities if not ObjectId.is_valid(i)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid product ID: {', '.join(invalid)}"
+        )
+    
+    loader = ProductLoader(db)
+    products = await loader.load_many(quantities)
+    missing = [i for i in quantities if i not in products]
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cart not found"
+            detail=f"Product not found: {', '.join(missing)}"
         )
     
-    items = cart.get("items", [])
-    item_to_update = next((i for i in items if i["product_id"] == item_id), None)
+    short = [i for i, quantity in quantities.items() if products[i]["stock"] < quantity]
+    user_id = str(current_user.id)
+    cart = None if short else await add_cart_items(db, user_id, quantities, products)
     
-    if not item_to_update:
+    if cart is None:
+        if not short:
+            # Report the lines that existing cart quantities push over stock
+            current = await db.carts.find_one({"user_id": user_id}, {"items": 1}) or {}
+            in_cart = {i["product_id"]: i["quantity"] for i in current.get("items", [])}
+            short = [
+                i for i, quantity in quantities.items()
+                if in_cart.get(i, 0) + quantity > products[i]["stock"]
+            ]
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item not in cart"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient stock: {', '.join(short)}"
         )
     
+    return await get_cart_with_details(user_id, db, loader=loader, cart=cart)
+
+@router.put("/items/{item_id}", response_model=Union[CartResponse, CartDelta])
+async def update_cart_item(
+    item_id: str,
+    item_update: CartItemUpdate,
+    response: str = Query("full", regex=RESPONSE_MODES),
+    current_user: Principal = Depends(get_current_active_user),
+    db = Depends(get_database)
+):
+    """Update cart item quantity
+    
+    response=delta returns only the changed line and the new totals.
+    """
+    user_id = str(current_user.id)
+    
     # Verify stock
+    loader = ProductLoader(db)
     try:
-        product = await db.products.find_one({"_id": ObjectId(item_id)})
+        product = await loader.load(item_id)
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid product ID"
         )
     
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    
     if product["stock"] < item_update.quantity:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient stock"
         )
     
-    item_to_update["quantity"] = item_update.quantity
-    
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": items, "updated_at": datetime.utcnow()}}
+    cart = await db.carts.find_one_and_update(
+        {"user_id": user_id, "items.product_id": item_id},
+        cart_update(update_line(item_id, {"quantity": item_update.quantity, "price": product["price"]})),
+        return_document=ReturnDocument.AFTER
     )
     
-    return await get_cart_with_details(user_id, db)
+    if not cart:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not in cart"
+        )
+    
+    summary = await mutation_summary(db, cart, loader)
+    if response == "delta":
+        return cart_delta(item_id, cart, product, summary)
+    return await get_cart_with_details(user_id, db, loader=loader, cart=cart)
 
-@router.delete("/items/{item_id}", response_model=CartResponse)
+@router.delete("/items/{item_id}", response_model=Union[CartResponse, CartDelta])
 async def remove_from_cart(
     item_id: str,
-    current_user: User = Depends(get_current_active_user),
+    response: str = Query("full", regex=RESPONSE_MODES),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
-    """Remove item from cart"""
+    """Remove item from cart
+    
+    response=delta returns only the new totals.
+    """
     user_id = str(current_user.id)
-    cart = await db.carts.find_one({"user_id": user_id})
+    cart = await db.carts.find_one_and_update(
+        {"user_id": user_id},
+        cart_update({"$filter": {
+            "input": {"$ifNull": ["$items", []]},
+            "as": "line",
+            "cond": {"$ne": ["$$line.product_id", {"$literal": item_id}]}
+        }}),
+        return_document=ReturnDocument.AFTER
+    )
     
     if not cart:
         raise HTTPException(
@@ -190,25 +441,24 @@ async def remove_from_cart(
             detail="Cart not found"
         )
     
-    items = [i for i in cart.get("items", []) if i["product_id"] != item_id]
-    
-    await db.carts.update_one(
-        {"user_id": user_id},
-        {"$set": {"items": items, "updated_at": datetime.utcnow()}}
-    )
-    
-    return await get_cart_with_details(user_id, db)
+    summary = await mutation_summary(db, cart)
+    if response == "delta":
+        return cart_delta(item_id, cart, None, summary)
+    return await get_cart_with_details(user_id, db, cart=cart)
 
 @router.delete("/", response_model=dict)
 async def clear_cart(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Clear entire cart"""
     user_id = str(current_user.id)
     await db.carts.update_one(
         {"user_id": user_id},
-        {"$set": {"items": [], "updated_at": datetime.utcnow()}}
+        {
+            "$set": {"items": [], "item_count": 0, "total": 0.0, "updated_at": datetime.utcnow()},
+            "$inc": {"version": 1}
+        }
     )
     
     return {"message": "Cart cleared successfully"}
@@ -1,18 +1,94 @@
 from fastapi import APIRouter, HTTPException, status, Query, Depends
 from datetime import datetime
 from bson import ObjectId
-import math
-from app.schemas.order import OrderResponse, OrderCreate, OrderList, OrderStatus, OrderItemBase
+from typing import Optional, Union
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+import asyncio
+from app.schemas.order import (
+    OrderResponse,
+    OrderCreate,
+    OrderList,
+    OrderStatus,
+    OrderItemBase,
+    OrderSummary,
+    OrderSummaryList
+)
 from app.api.deps import get_current_active_user
+from app.core.cache import catalog_version, product_cache
 from app.core.database import get_database
-from app.models.user import User
+from app.core.loaders import ProductLoader
+from app.core.serialization import ORJSONResponse, trusted, trusted_list
+from app.core.pagination import COUNT_MODES, apply_cursor, count_documents, next_cursor, page_count
+from app.models.user import Principal
 
 router = APIRouter()
 
+# Fields left out of order history in summary mode
+SUMMARY_PROJECTION = {"items": 0, "shipping_address": 0}
+
+def bump_products(items: list):
+    """Invalidate cached responses for products whose stock changed"""
+    for item in items:
+        product_cache.bump(item["product_id"])
+    catalog_version.bump()
+
+async def reserve_stock(db, items: list, reservation_id: str) -> bool:
+    """Atomically decrement stock for every item, or for none of them
+    
+    Each decrement only applies while stock >= quantity and tags the product
+    with the reservation id, so a partial failure can be undone exactly. If
+    the write itself fails, whatever it applied is released before re-raising.
+    """
+    try:
+        result = await db.products.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(item["product_id"]), "stock": {"$gte": item["quantity"]}},
+                {
+                    "$inc": {"stock": -item["quantity"]},
+                    "$push": {"reservations": reservation_id},
+                    "$set": {"updated_at": datetime.utcnow()}
+                }
+            )
+            for item in items
+        ], ordered=False)
+    except PyMongoError:
+        await release_stock(db, items, reservation_id)
+        raise
+    bump_products(items)
+    
+    if result.modified_count == len(items):
+        return True
+    
+    await release_stock(db, items, reservation_id)
+    return False
+
+async def release_stock(db, items: list, reservation_id: str):
+    """Restore stock for the items that were decremented under a reservation"""
+    await db.products.bulk_write([
+        UpdateOne(
+            {"_id": ObjectId(item["product_id"]), "reservations": reservation_id},
+            {
+                "$inc": {"stock": item["quantity"]},
+                "$pull": {"reservations": reservation_id},
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+        )
+        for item in items
+    ], ordered=False)
+    bump_products(items)
+
+async def confirm_stock(db, items: list, reservation_id: str):
+    """Drop the reservation tag once the order has been stored"""
+    await db.products.update_many(
+        {"_id": {"$in": [ObjectId(item["product_id"]) for item in items]}},
+        {"$pull": {"reservations": reservation_id}}
+    )
+
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Create a new order"""
@@ -26,12 +102,16 @@ async def create_order(
             detail="Cart is empty"
         )
     
+    # Load every product in the cart with a single query
+    loader = ProductLoader(db)
+    products = await loader.load_many(item["product_id"] for item in cart["items"])
+    
     # Prepare order items and calculate total
     order_items = []
     total = 0.0
     
     for item in cart["items"]:
-        product = await db.products.find_one({"_id": ObjectId(item["product_id"])})
+        product = products.get(item["product_id"])
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -53,15 +133,20 @@ async def create_order(
             subtotal=subtotal
         ))
         total += subtotal
-        
-        # Update product stock
-        await db.products.update_one(
-            {"_id": ObjectId(item["product_id"])},
-            {"$inc": {"stock": -item["quantity"]}}
+    
+    # Update product stock; concurrent checkouts can still win the race,
+    # so the decrements are guarded and rolled back on partial failure
+    order_id = ObjectId()
+    reservation_id = str(order_id)
+    if not await reserve_stock(db, cart["items"], reservation_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient stock for one or more items"
         )
     
     # Create order
     new_order = {
+        "_id": order_id,
         "user_id": user_id,
         "items": [item.model_dump() for item in order_items],
         "total": total,
@@ -72,53 +157,66 @@ async def create_order(
         "updated_at": datetime.utcnow()
     }
     
-    result = await db.orders.insert_one(new_order)
-    new_order["id"] = str(result.inserted_id)
+    try:
+        await db.orders.insert_one(new_order)
+    except Exception:
+        await release_stock(db, cart["items"], reservation_id)
+        raise
+    new_order["id"] = reservation_id
+    
+    await confirm_stock(db, cart["items"], reservation_id)
     
     # Clear cart
     await db.carts.update_one(
         {"user_id": user_id},
-        {"$set": {"items": [], "updated_at": datetime.utcnow()}}
+        {
+            "$set": {"items": [], "item_count": 0, "total": 0.0, "updated_at": datetime.utcnow()},
+            "$inc": {"version": 1}
+        }
     )
     
-    return OrderResponse(**new_order)
+    return ORJSONResponse(trusted(OrderResponse, new_order), status_code=status.HTTP_201_CREATED)
 
-@router.get("/", response_model=OrderList)
+@router.get("/", response_model=Union[OrderList, OrderSummaryList])
 async def get_user_orders(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex=COUNT_MODES),
+    summary: bool = False,
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
-    """Get user's order history"""
-    user_id = str(current_user.id)
+    """Get user's order history
     
-    # Get total count
-    total = await db.orders.count_documents({"user_id": user_id})
+    summary=true leaves out items and shipping_address.
+    """
+    user_id = str(current_user.id)
     
     # Calculate pagination
-    skip = (page - 1) * limit
-    pages = math.ceil(total / limit)
-    
-    # Get orders
-    cursor = db.orders.find({"user_id": user_id}).sort("created_at", -1).skip(skip).limit(limit)
-    orders = await cursor.to_list(length=limit)
-    
-    # Convert ObjectId to string
-    for order in orders:
-        order["id"] = str(order["_id"])
-    
-    return OrderList(
-        orders=[OrderResponse(**o) for o in orders],
-        total=total,
-        page=page,
-        pages=pages
+    skip = 0 if cursor else (page - 1) * limit
+    
+    # Get orders and total count concurrently
+    total, orders = await asyncio.gather(
+        count_documents(db.orders, {"user_id": user_id}, count),
+        db.orders.find(
+            apply_cursor({"user_id": user_id}, cursor, "created_at", -1),
+            SUMMARY_PROJECTION if summary else None
+        ).sort([("created_at", -1), ("_id", -1)]).skip(skip).limit(limit).to_list(length=limit)
     )
+    
+    return ORJSONResponse({
+        "orders": trusted_list(OrderSummary if summary else OrderResponse, orders),
+        "total": total,
+        "page": page,
+        "pages": page_count(total, limit),
+        "next_cursor": next_cursor(orders, limit, "created_at")
+    })
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Get order by ID"""
@@ -143,13 +241,12 @@ async def get_order(
             detail="Not authorized to access this order"
         )
     
-    order["id"] = str(order["_id"])
-    return OrderResponse(**order)
+    return ORJSONResponse(trusted(OrderResponse, order))
 
 @router.put("/{order_id}/cancel", response_model=OrderResponse)
 async def cancel_order(
     order_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Cancel an order"""
@@ -185,8 +282,9 @@ async def cancel_order(
     for item in order["items"]:
         await db.products.update_one(
             {"_id": ObjectId(item["product_id"])},
-            {"$inc": {"stock": item["quantity"]}}
+            {"$inc": {"stock": item["quantity"]}, "$set": {"updated_at": datetime.utcnow()}}
         )
+    bump_products(order["items"])
     
     # Update order status
     await db.orders.update_one(
@@ -196,14 +294,13 @@ async def cancel_order(
     
     # Get updated order
     updated_order = await db.orders.find_one({"_id": ObjectId(order_id)})
-    updated_order["id"] = str(updated_order["_id"])
     
-    return OrderResponse(**updated_order)
+    return ORJSONResponse(trusted(OrderResponse, updated_order))
 
 @router.get("/{order_id}/status")
 async def get_order_status(
     order_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Get order status"""
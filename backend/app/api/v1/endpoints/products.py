@@ -1,36 +1,86 @@
-from fastapi import APIRouter, HTTPException, status, Query, Depends
-from typing import Optional
-from bson import ObjectId
-import math
-from app.schemas.product import ProductResponse, ProductList
+from fastapi import APIRouter, HTTPException, status, Query, Depends, Request, Response
+from typing import List, Optional, Union
+from bson import ObjectId, json_util
+import asyncio
+import re
+from app.schemas.product import (
+    ProductResponse,
+    ProductList,
+    ProductSummary,
+    ProductSummaryList,
+    ProductBatch,
+    ProductBatchRequest,
+    MAX_BATCH_IDS,
+    ProductSuggestion,
+    SuggestionList,
+    ProductFacets,
+    CategoryFacet,
+    PriceRangeFacet
+)
+from app.core.cache import catalog_version, facet_cache, page_cache, page_flight, product_cache, product_flight
+from app.core.conditional import body_etag, cache_headers, is_not_modified, not_modified
+from app.core.serialization import dumps, trusted, trusted_list
 from app.core.database import get_database
+from app.core.search import search_index, suggest_index, top_hits, trigram_index
+from app.core.pagination import COUNT_MODES, apply_cursor, count_documents, next_cursor, page_count
 
 router = APIRouter()
 
-@router.get("/", response_model=ProductList)
-async def get_products(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
+# Facets accepted by get_products
+FACET_NAMES = "^(category|price)(,(category|price))*$"
+PRICE_BUCKETS = 5
+
+# Sparse fieldsets accepted by fields=; "grid" is what the product grid renders
+FIELD_NAMES = "name|description|price|category|stock|images|specifications|created_at|updated_at"
+PRODUCT_FIELDS = f"^(grid|({FIELD_NAMES})(,({FIELD_NAMES}))*)$"
+GRID_PROJECTION = {"name": 1, "price": 1, "stock": 1, "images": {"$slice": 1}}
+
+def product_fields(fields: Optional[str]):
+    """Map a fields= parameter to (response model, field names, Mongo projection)"""
+    if not fields:
+        return ProductResponse, None, None
+    if fields == "grid":
+        return ProductSummary, None, GRID_PROJECTION
+    names = frozenset(fields.split(","))
+    return ProductResponse, names, {name: 1 for name in names}
+
+def merge_projection(projection: Optional[dict], sort_field: str) -> Optional[dict]:
+    """Add what sorting and cursors need to a projection"""
+    if sort_field == "relevance":
+        return {**(projection or {}), "score": {"$meta": "textScore"}}
+    if projection is None:
+        return None
+    return {**projection, sort_field: 1}
+
+def pipeline_projection(projection: dict) -> dict:
+    """Rewrite a find projection for $project, where $slice takes [array, n]"""
+    return {
+        name: {"$slice": [f"${name}", value["$slice"]]} if isinstance(value, dict) and "$slice" in value else value
+        for name, value in projection.items()
+    }
+
+def build_product_filter(
     category: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: Optional[str] = Query(None, regex="^(price|name|created_at)$"),
-    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
-    db = Depends(get_database)
-):
-    """Get products with filters and pagination"""
-    # Build query
+    prefix: bool = False
+) -> dict:
+    """Build the product query filter
+    
+    Searches use the name/description text index; prefix=True instead
+    matches names starting with the search term.
+    """
     query_filter = {}
     
     if category:
         query_filter["category"] = category
     
     if search:
-        query_filter["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
+        if prefix:
+            query_filter["name"] = {"$regex": f"^{re.escape(search)}", "$options": "i"}
+        else:
+            query_filter["$text"] = {"$search": search}
     
     if min_price is not None or max_price is not None:
         price_filter = {}
@@ -40,78 +90,475 @@ async def get_products(
             price_filter["$lte"] = max_price
         query_filter["price"] = price_filter
     
-    # Get total count
-    total = await db.products.count_documents(query_filter)
+    return query_filter
+
+def product_sort(sort_field: str, sort_direction: int) -> list:
+    """Return the sort specification, with _id breaking ties so cursors are stable"""
+    if sort_field == "relevance":
+        return [("score", {"$meta": "textScore"}), ("_id", 1)]
+    return [(sort_field, sort_direction), ("_id", sort_direction)]
+
+async def has_text_match(db, base_filter: dict, category: Optional[str]) -> bool:
+    """Check whether a text search matches any product under the filters"""
+    query_filter = {**base_filter, "category": category} if category else base_filter
+    return await db.products.find_one(query_filter, {"_id": 1}) is not None
+
+async def find_products_page(
+    db,
+    base_filter: dict,
+    category: Optional[str],
+    sort_field: str,
+    sort_direction: int,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    count: str,
+    facets: frozenset = frozenset(),
+    projection: Optional[dict] = None
+):
+    """Fetch one page of products with its total count and requested facets"""
+    if facets:
+        return await find_products_faceted(
+            db, base_filter, category, sort_field, sort_direction, skip, limit, cursor, facets, projection
+        )
     
-    # Calculate pagination
+    query_filter = {**base_filter, "category": category} if category else base_filter
+    products_cursor = db.products.find(
+        apply_cursor(query_filter, cursor, sort_field, sort_direction),
+        merge_projection(projection, sort_field)
+    ).sort(product_sort(sort_field, sort_direction))
+    
+    total, products = await asyncio.gather(
+        count_documents(db.products, query_filter, count),
+        products_cursor.skip(skip).limit(limit).to_list(length=limit)
+    )
+    return total, products, None
+
+async def find_products_faceted(
+    db,
+    base_filter: dict,
+    category: Optional[str],
+    sort_field: str,
+    sort_direction: int,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    facets: frozenset,
+    projection: Optional[dict] = None
+):
+    """Fetch a page, its total and facet counts in one $facet aggregation
+    
+    Category counts ignore the category filter so every category stays
+    selectable; totals and price ranges respect it. Totals and facets are
+    cached per filter shape, after which only the page itself is queried.
+    """
+    cache_key = (json_util.dumps(base_filter), category, tuple(sorted(facets)))
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        _, products, _ = await find_products_page(
+            db, base_filter, category, sort_field, sort_direction, skip, limit, cursor, "none",
+            projection=projection
+        )
+        return cached["total"], products, cached["facets"]
+    
+    match_category = [{"$match": {"category": category}}] if category else []
+    results = list(match_category)
+    if cursor:
+        results.append({"$match": apply_cursor({}, cursor, sort_field, sort_direction)})
+    results += [
+        {"$sort": dict(product_sort(sort_field, sort_direction))},
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
+    if projection is not None:
+        results.append({"$project": pipeline_projection(merge_projection(projection, sort_field))})
+    
+    stages = {
+        "results": results,
+        "total": match_category + [{"$count": "count"}]
+    }
+    if "category" in facets:
+        stages["categories"] = [
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}}
+        ]
+    if "price" in facets:
+        stages["price_ranges"] = match_category + [
+            {"$bucketAuto": {"groupBy": "$price", "buckets": PRICE_BUCKETS}}
+        ]
+    
+    pipeline = [{"$match": base_filter}] if base_filter else []
+    pipeline.append({"$facet": stages})
+    result = (await db.products.aggregate(pipeline).to_list(length=1))[0]
+    
+    total = result["total"][0]["count"] if result["total"] else 0
+    facet_data = ProductFacets(
+        categories=[
+            CategoryFacet(category=c["_id"], count=c["count"])
+            for c in result["categories"]
+        ] if "category" in facets else None,
+        price_ranges=[
+            PriceRangeFacet(min=b["_id"]["min"], max=b["_id"]["max"], count=b["count"])
+            for b in result["price_ranges"]
+        ] if "price" in facets else None
+    )
+    facet_cache.set(cache_key, {"total": total, "facets": facet_data})
+    return total, result["results"], facet_data
+
+async def ranked_products_page(
+    db,
+    hits: list,
+    page: int,
+    limit: int,
+    total: Optional[int] = None,
+    fields: Optional[str] = None
+) -> dict:
+    """Load one page of ranked (id, score) hits, keeping the ranked order"""
+    model, names, projection = product_fields(fields)
+    total = len(hits) if total is None else total
     skip = (page - 1) * limit
-    pages = math.ceil(total / limit)
+    page_ids = [doc_id for doc_id, _ in hits[skip:skip + limit]]
+    products = await db.products.find(
+        {"_id": {"$in": [ObjectId(i) for i in page_ids]}},
+        projection
+    ).to_list(length=limit)
+    by_id = {str(p["_id"]): p for p in products}
+    
+    ranked = [by_id[doc_id] for doc_id in page_ids if doc_id in by_id]
+    
+    return {
+        "products": trusted_list(model, ranked, names),
+        "total": total,
+        "page": page,
+        "pages": page_count(total, limit),
+        "next_cursor": None,
+        "facets": None
+    }
+
+async def list_products(
+    db,
+    page: int,
+    limit: int,
+    category: Optional[str],
+    search: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    sort_field: str,
+    sort_order: str,
+    cursor: Optional[str],
+    count: str,
+    fuzzy: bool,
+    facets: tuple,
+    fields: Optional[str]
+) -> dict:
+    """Build one page of the product listing"""
+    if fuzzy and search and trigram_index.ready:
+        scores = trigram_index.scores(search)
+        if category is not None or min_price is not None or max_price is not None:
+            allowed = search_index.filter(scores, category, min_price, max_price)
+            scores = {doc_id: scores[doc_id] for doc_id in allowed}
+        hits = top_hits(scores, page * limit)
+        return await ranked_products_page(db, hits, page, limit, total=len(scores), fields=fields)
     
-    # Build sort
-    sort_field = sort_by or "created_at"
     sort_direction = 1 if sort_order == "asc" else -1
     
-    # Get products
-    cursor = db.products.find(query_filter).sort(sort_field, sort_direction).skip(skip).limit(limit)
-    products = await cursor.to_list(length=limit)
+    if cursor and sort_field == "relevance":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination is not supported for relevance sort"
+        )
     
-    # Convert ObjectId to string
-    for product in products:
-        product["id"] = str(product["_id"])
+    # Calculate pagination
+    skip = 0 if cursor else (page - 1) * limit
+    relevance = sort_field == "relevance"
     
-    return ProductList(
-        products=[ProductResponse(**p) for p in products],
-        total=total,
-        page=page,
-        pages=pages
+    # The text index only matches whole words, so partially typed queries
+    # match name prefixes instead. The mode is chosen by probing for any text
+    # match, not by the page coming back empty, so every page and cursor of
+    # a query uses the mode its first page did.
+    base_filter = build_product_filter(None, search, min_price, max_price)
+    if search and not await has_text_match(db, base_filter, category):
+        if relevance:
+            sort_field = "name"
+            sort_direction = 1
+        base_filter = build_product_filter(None, search, min_price, max_price, prefix=True)
+    
+    # Get products, total count and facets
+    facet_names = frozenset(facets)
+    model, names, projection = product_fields(fields)
+    total, products, facet_data = await find_products_page(
+        db, base_filter, category, sort_field, sort_direction, skip, limit, cursor, count, facet_names, projection
     )
+    
+    return {
+        "products": trusted_list(model, products, names),
+        "total": total,
+        "page": page,
+        "pages": page_count(total, limit),
+        # Relevance sort only pages by number, even when it fell back to prefix mode
+        "next_cursor": None if relevance else next_cursor(products, limit, sort_field),
+        "facets": facet_data
+    }
 
-@router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str, db = Depends(get_database)):
-    """Get product by ID"""
-    try:
-        product = await db.products.find_one({"_id": ObjectId(product_id)})
-    except:
+@router.get("/", response_model=Union[ProductList, ProductSummaryList])
+async def get_products(
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = Query(None, regex="^(price|name|created_at|relevance)$"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex=COUNT_MODES),
+    fuzzy: bool = False,
+    facets: Optional[str] = Query(None, regex=FACET_NAMES),
+    fields: Optional[str] = Query(None, regex=PRODUCT_FIELDS),
+    db = Depends(get_database)
+):
+    """Get products with filters and pagination
+    
+    Pass the returned next_cursor as cursor to page with a range query
+    instead of skipping; page is ignored when a cursor is given. count
+    selects how total is computed: exact, estimated or none. sort_by=relevance
+    orders search results by text score and only supports page numbers.
+    fuzzy=true matches misspelled search terms against product names and
+    ranks by similarity. facets=category,price adds category counts and
+    price ranges computed in the same round trip as the page. fields limits
+    each product to a comma-separated list of fields; fields=grid returns
+    only name, price, stock and the first image. Responses carry a digest
+    of the body as ETag, which matches across workers, and answer 304 while
+    it still matches.
+    """
+    # Capture the version before reading so a concurrent write moves it on
+    version = catalog_version.counter
+    
+    # Normalize the parameters so equivalent queries share a cache entry
+    search = (search.strip().lower() or None) if search else None
+    sort_field = sort_by or "created_at"
+    if sort_field == "relevance" and not search:
+        sort_field = "created_at"
+    facet_names = tuple(sorted(set(facets.split(",")))) if facets else ()
+    if fields and fields != "grid":
+        fields = ",".join(sorted(set(fields.split(","))))
+    params = (
+        page, limit, category, search, min_price, max_price, sort_field, sort_order,
+        cursor, count, fuzzy, facet_names, fields
+    )
+    
+    key = (version,) + params
+    entry = page_cache.get(key)
+    if entry is None:
+        async def render() -> tuple:
+            rendered = dumps(await list_products(db, *params))
+            page = (rendered, body_etag(rendered))
+            page_cache.set(key, page)
+            return page
+        entry = await page_flight.do(key, render)
+    
+    # Listings are validated by ETag only: a per-process timestamp at
+    # one-second resolution would answer stale 304s to If-Modified-Since
+    body, etag = entry
+    headers = cache_headers(etag)
+    if is_not_modified(request, etag):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/suggest", response_model=SuggestionList)
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=10)
+):
+    """Autocomplete product names and categories from the in-memory trie"""
+    return SuggestionList(
+        query=q,
+        suggestions=[
+            ProductSuggestion(
+                text=entry["text"],
+                type=entry["type"],
+                product_id=entry["product_id"],
+                category=entry["category"]
+            )
+            for entry in suggest_index.suggest(q, limit)
+        ]
+    )
+
+def product_entry(product: dict) -> tuple:
+    """Serialize a product for the response cache with its ETag and Last-Modified"""
+    body = dumps(trusted(ProductResponse, product))
+    return body, body_etag(body), product.get("updated_at")
+
+async def load_product_entry(db, product_id: str, version: tuple) -> Optional[tuple]:
+    """Read one product and cache its serialized entry"""
+    product = await db.products.find_one({"_id": ObjectId(product_id)})
+    if product is None:
+        return None
+    entry = product_entry(product)
+    product_cache.set(product_id, entry, version)
+    return entry
+
+async def load_product_batch(db, product_ids: List[str]) -> Response:
+    """Resolve ids from the product cache, then fetch the rest with one $in query
+    
+    Products keep the requested order; malformed ids are reported as invalid
+    and unknown ids as missing instead of failing the whole request.
+    """
+    ordered, invalid = [], []
+    for product_id in dict.fromkeys(product_ids):
+        if ObjectId.is_valid(product_id):
+            ordered.append(str(ObjectId(product_id)))
+        else:
+            invalid.append(product_id)
+    ordered = list(dict.fromkeys(ordered))
+    
+    bodies = {}
+    versions = {}
+    for product_id in ordered:
+        cached = product_cache.get(product_id)
+        if cached is not None:
+            bodies[product_id] = cached[0]
+        else:
+            versions[product_id] = product_cache.version(product_id)
+    
+    if versions:
+        cursor = db.products.find({"_id": {"$in": [ObjectId(i) for i in versions]}})
+        async for product in cursor:
+            product_id = str(product["_id"])
+            entry = product_entry(product)
+            product_cache.set(product_id, entry, versions[product_id])
+            bodies[product_id] = entry[0]
+    
+    # Splice the cached product bodies in as they are
+    found = b",".join(bodies[i] for i in ordered if i in bodies)
+    missing = [i for i in ordered if i not in bodies]
+    content = b'{"products":[' + found + b'],"missing":' + dumps(missing) + b',"invalid":' + dumps(invalid) + b"}"
+    return Response(content=content, media_type="application/json")
+
+@router.get("/batch", response_model=ProductBatch)
+async def get_products_batch(
+    ids: str = Query(..., min_length=1),
+    db = Depends(get_database)
+):
+    """Get several products by comma-separated ids"""
+    product_ids = [i.strip() for i in ids.split(",") if i.strip()]
+    if len(product_ids) > MAX_BATCH_IDS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid product ID"
+            detail=f"At most {MAX_BATCH_IDS} ids per request"
         )
+    return await load_product_batch(db, product_ids)
+
+@router.post("/batch", response_model=ProductBatch)
+async def post_products_batch(batch: ProductBatchRequest, db = Depends(get_database)):
+    """Get several products by id, for lists too long for a query string"""
+    return await load_product_batch(db, batch.ids)
+
+@router.get("/{product_id}", response_model=ProductResponse)
+async def get_product(product_id: str, request: Request, db = Depends(get_database)):
+    """Get product by ID
     
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
+    The ETag is a digest of the body; a matching If-None-Match or
+    If-Modified-Since is answered with 304. Concurrent requests for the
+    same uncached product share one database read.
+    """
+    entry = product_cache.get(product_id)
+    if entry is None:
+        if not ObjectId.is_valid(product_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid product ID"
+            )
+        
+        # Capture the version before reading so a concurrent write wins;
+        # concurrent misses at the same version share one query
+        version = product_cache.version(product_id)
+        entry = await product_flight.do(
+            (product_id, version),
+            lambda: load_product_entry(db, product_id, version)
         )
+        
+        if entry is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
     
-    product["id"] = str(product["_id"])
-    return ProductResponse(**product)
+    body, etag, last_modified = entry
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@router.get("/category/{category_name}", response_model=ProductList)
+@router.get("/category/{category_name}", response_model=Union[ProductList, ProductSummaryList])
 async def get_products_by_category(
     category_name: str,
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex=COUNT_MODES),
+    fields: Optional[str] = Query(None, regex=PRODUCT_FIELDS),
     db = Depends(get_database)
 ):
     """Get products by category"""
     return await get_products(
+        request=request,
         page=page,
         limit=limit,
         category=category_name,
+        sort_by=None,
+        sort_order="asc",
+        cursor=cursor,
+        count=count,
+        fuzzy=False,
+        facets=None,
+        fields=fields,
         db=db
     )
 
-@router.get("/search/{query}", response_model=ProductList)
+@router.get("/search/{query}", response_model=Union[ProductList, ProductSummaryList])
 async def search_products(
     query: str,
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    count: str = Query("exact", regex=COUNT_MODES),
+    fields: Optional[str] = Query(None, regex=PRODUCT_FIELDS),
     db = Depends(get_database)
 ):
-    """Search products"""
-    return await get_products(
-        page=page,
-        limit=limit,
-        search=query,
-        db=db
-    )
+    """Search products
+    
+    Ranked by BM25 from the in-memory search index; falls back to the
+    database search when the index is not built or finds nothing.
+    """
+    hits = search_index.search(query, category, min_price, max_price) if search_index.ready else []
+    if not hits:
+        return await get_products(
+            request=request,
+            page=page,
+            limit=limit,
+            category=category,
+            search=query,
+            min_price=min_price,
+            max_price=max_price,
+            sort_by="relevance",
+            sort_order="asc",
+            cursor=None,
+            count=count,
+            fuzzy=False,
+            facets=None,
+            fields=fields,
+            db=db
+        )
+    
+    body = dumps(await ranked_products_page(db, hits, page, limit, fields=fields))
+    etag = body_etag(body)
+    headers = cache_headers(etag)
+    if is_not_modified(request, etag):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -2,14 +2,15 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import datetime
 from bson import ObjectId
 from app.schemas.user import UserResponse, UserUpdate
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_user, get_current_profile
+from app.core.cache import user_cache
 from app.core.database import get_database
-from app.models.user import User
+from app.models.user import Principal, User
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(current_user: User = Depends(get_current_active_user)):
+async def get_current_user(current_user: User = Depends(get_current_profile)):
     """Get current user profile"""
     return UserResponse(
         id=str(current_user.id),
@@ -25,7 +26,7 @@ async def get_current_user(current_user: User = Depends(get_current_active_user)
 @router.put("/me", response_model=UserResponse)
 async def update_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Update user profile"""
@@ -42,6 +43,7 @@ async def update_profile(
         {"_id": ObjectId(current_user.id)},
         {"$set": update_data}
     )
+    user_cache.bump(current_user.id)
     
     if result.modified_count == 0:
         raise HTTPException(
@@ -58,7 +60,7 @@ async def update_profile(
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db = Depends(get_database)
 ):
     """Get user by ID"""
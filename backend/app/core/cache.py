@@ -0,0 +1,168 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from app.core.config import settings
+from app.core.invalidation import subscribe
+from app.core.singleflight import flight_group
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry, or default when missing or expired"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry, evicting the least recently used one when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Drop an entry if present"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class VersionedCache:
+    """TTL cache whose entries are only valid for the version they were read at
+    
+    Writers bump a key's version; readers capture the version before going
+    to the database, so a value read concurrently with a write is never
+    served once the write has bumped the version.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def version(self, key: Hashable) -> tuple:
+        """Return the current version of a key"""
+        return (self._epoch, self._versions.get(key, 0))
+
+    def bump(self, key: Hashable):
+        """Invalidate a key by moving it to a new version"""
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._cache.delete(key)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value if it matches the current version"""
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        version, value = entry
+        if version != self.version(key):
+            self.stale += 1
+            self.misses += 1
+            self._cache.delete(key)
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, version: tuple):
+        """Store a value read at the given version"""
+        if version == self.version(key):
+            self._cache.set(key, (version, value))
+
+    def clear(self):
+        """Drop every entry and move every key to a new version"""
+        self._epoch += 1
+        self._versions.clear()
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+class CatalogVersion:
+    """Catalog-wide version, moved forward by every product write a worker sees
+    
+    Only keys this worker's page cache; listing ETags are digests of the
+    body, so they match across workers.
+    """
+
+    def __init__(self):
+        self.counter = 0
+
+    def bump(self):
+        """Move the catalog to a new version"""
+        self.counter += 1
+
+
+# Product list totals and facet counts per filter shape
+facet_cache = TTLCache(maxsize=512, ttl=settings.FACET_CACHE_TTL_SECONDS)
+
+# Serialized GET /products/{id} responses
+product_cache = VersionedCache(
+    maxsize=settings.PRODUCT_CACHE_SIZE,
+    ttl=settings.PRODUCT_CACHE_TTL_SECONDS
+)
+product_flight = flight_group("products")
+
+# Version of everything listing endpoints serve
+catalog_version = CatalogVersion()
+
+# Serialized GET /products pages and their ETags, keyed by catalog version and normalized
+# query parameters; pages from older versions are never read again and age out
+page_cache = TTLCache(maxsize=settings.PAGE_CACHE_SIZE, ttl=settings.PAGE_CACHE_TTL_SECONDS)
+page_flight = flight_group("product_pages")
+
+# Authenticated principals (User models) by user id; shared between
+# requests, so callers must treat them as read-only
+user_cache = VersionedCache(
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+subscribe("products", lambda product_id, product: product_cache.bump(product_id))
+subscribe("products", lambda product_id, product: catalog_version.bump())
+subscribe("users", lambda user_id, user: user_cache.bump(user_id))
@@ -18,6 +18,15 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 30
+    TOKEN_VERSION_REFRESH_SECONDS: int = 30
+    TOKEN_CACHE_SIZE: int = 10000
+    REVOKED_TOKENS_CAPACITY: int = 100000
+    REVOKED_TOKENS_FALSE_POSITIVE_RATE: float = 0.001
+    REVOKED_TOKENS_REFRESH_SECONDS: int = 60
     
     # CORS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -42,6 +51,17 @@ class Settings(BaseSettings):
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
+    COUNT_CACHE_TTL_SECONDS: int = 30
+    FACET_CACHE_TTL_SECONDS: int = 60
+    PRODUCT_CACHE_SIZE: int = 10000
+    PRODUCT_CACHE_TTL_SECONDS: int = 300
+    CATALOG_MAX_AGE_SECONDS: int = 60
+    PAGE_CACHE_SIZE: int = 2048
+    PAGE_CACHE_TTL_SECONDS: int = 60
+    
+    # Cross-worker cache invalidation
+    CHANGE_STREAMS_ENABLED: bool = True
+    CACHE_INVALIDATION_POLL_SECONDS: float = 5.0
     
     class Config:
         env_file = ".env"
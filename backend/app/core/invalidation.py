@@ -0,0 +1,163 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.config import settings
+
+# Error codes returned when change streams are unavailable (standalone server)
+CHANGE_STREAM_UNSUPPORTED = {20, 40573}
+
+# Only user changes that affect the cached principal are broadcast
+USER_PRINCIPAL_FIELDS = ["is_active", "is_admin", "email", "first_name", "last_name", "phone", "hashed_password", "token_version"]
+USER_PIPELINE = [{"$match": {"$or": [
+    {"operationType": {"$in": ["insert", "replace", "delete"]}},
+    *({f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in USER_PRINCIPAL_FIELDS)
+]}}]
+
+# Revoked tokens are only ever inserted; TTL deletes need not be broadcast
+REVOKED_TOKEN_PIPELINE = [{"$match": {"operationType": "insert"}}]
+
+# Deleted-user tombstones only matter when written; TTL deletes are dropped
+TOMBSTONE_PIPELINE = [{"$match": {"operationType": {"$ne": "delete"}}}]
+
+# Tombstone collections read by the polling fallback, which cannot see deletes;
+# user deletes already arrive through the watched deleted_users collection
+TOMBSTONES = {"products": "deleted_products"}
+
+# Product tombstones only need to outlive the slowest poll
+PRODUCT_TOMBSTONE_TTL = timedelta(days=1)
+
+Listener = Callable[[str, Optional[dict]], None]
+
+listeners: Dict[str, List[Listener]] = {}
+
+
+def subscribe(collection: str, listener: Listener):
+    """Register a listener called with (document id, document or None on delete)"""
+    listeners.setdefault(collection, []).append(listener)
+
+
+def publish(collection: str, doc_id: str, document: Optional[dict]):
+    """Notify local listeners that a document changed"""
+    for listener in listeners.get(collection, []):
+        try:
+            listener(doc_id, document)
+        except Exception as e:
+            print(f"Invalidation listener failed for {collection}/{doc_id}: {e!r}")
+
+
+async def record_deletion(db, collection: str, doc_id: str, ttl: timedelta):
+    """Leave a tombstone so workers polling updated_at also see a delete"""
+    now = datetime.utcnow()
+    # TTL-indexed on expires_at; updated_at is read by the polling watcher
+    await db[TOMBSTONES[collection]].update_one(
+        {"_id": doc_id},
+        {"$set": {"expires_at": now + ttl, "updated_at": now}},
+        upsert=True
+    )
+
+
+class InvalidationWatcher:
+    """Broadcast writes made by any worker to this worker's caches
+    
+    Follows a change stream per collection, resuming after transient errors.
+    When change streams are unavailable it falls back to polling documents
+    whose updated_at moved past a watermark, and reads deletes from the
+    collection's tombstones. Writes are delivered from the point recorded
+    by mark(), so state loaded after marking misses nothing.
+    """
+
+    def __init__(self, db, collections: Dict[str, list]):
+        self.db = db
+        self.collections = collections
+        self.mode: Dict[str, str] = {}
+        self.marked_at: Optional[datetime] = None
+        self._operation_time = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def mark(self):
+        """Record the point from which start() delivers writes"""
+        self.marked_at = datetime.utcnow()
+        # Only replica sets report an operation time; polling uses marked_at
+        self._operation_time = (await self.db.command("ping")).get("operationTime")
+
+    def start(self):
+        """Start one background task per watched collection"""
+        for name, pipeline in self.collections.items():
+            self._tasks.append(asyncio.create_task(self._watch(name, pipeline)))
+
+    async def stop(self):
+        """Cancel the background tasks"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _dispatch(self, name: str, change: dict):
+        """Publish a change stream event to local listeners"""
+        doc_id = str(change["documentKey"]["_id"])
+        if change["operationType"] == "delete":
+            publish(name, doc_id, None)
+        elif change["operationType"] in ("insert", "update", "replace"):
+            publish(name, doc_id, change.get("fullDocument"))
+
+    async def _watch(self, name: str, pipeline: list):
+        """Follow the collection's change stream, or poll if unsupported"""
+        if not settings.CHANGE_STREAMS_ENABLED:
+            return await self._poll(name)
+        
+        resume_token = None
+        self.mode[name] = "change_stream"
+        while True:
+            try:
+                async with self.db[name].watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=resume_token,
+                    start_at_operation_time=None if resume_token else self._operation_time
+                ) as stream:
+                    resume_token = stream.resume_token
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._dispatch(name, change)
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    print(f"Change streams unavailable for {name}, polling updated_at instead")
+                    return await self._poll(name)
+                print(f"Change stream on {name} failed: {e!r}")
+                await asyncio.sleep(1)
+            except PyMongoError as e:
+                print(f"Change stream on {name} interrupted: {e!r}")
+                await asyncio.sleep(1)
+
+    async def _poll(self, name: str):
+        """Publish documents whose updated_at advanced since the last poll"""
+        self.mode[name] = "polling"
+        interval = settings.CACHE_INVALIDATION_POLL_SECONDS
+        tombstones = TOMBSTONES.get(name)
+        watermark = self.marked_at or datetime.utcnow()
+        while True:
+            await asyncio.sleep(interval)
+            # Overlap one interval so writes committed late or stamped by a
+            # skewed clock are not skipped; publishing twice is harmless
+            since = watermark - timedelta(seconds=interval)
+            started = datetime.utcnow()
+            try:
+                async for document in self.db[name].find({"updated_at": {"$gte": since}}):
+                    publish(name, str(document["_id"]), document)
+                if tombstones is not None:
+                    async for tombstone in self.db[tombstones].find({"updated_at": {"$gte": since}}, {"_id": 1}):
+                        publish(name, tombstone["_id"], None)
+                watermark = started
+            except PyMongoError as e:
+                print(f"Polling {name} failed: {e!r}")
+
+
+def create_watcher(db) -> InvalidationWatcher:
+    """Create the watcher for the collections backing local caches"""
+    return InvalidationWatcher(db, {
+        "products": [],
+        "users": USER_PIPELINE,
+        "deleted_users": TOMBSTONE_PIPELINE,
+        "revoked_tokens": REVOKED_TOKEN_PIPELINE
+    })
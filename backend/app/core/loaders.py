@@ -0,0 +1,50 @@
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+
+# Fields needed to render a cart line and check stock
+PRODUCT_CART_PROJECTION = {"name": 1, "price": 1, "images": 1, "stock": 1}
+
+
+class ProductLoader:
+    """Per-request product loader that batches lookups and memoizes results"""
+
+    def __init__(self, db, projection: Optional[dict] = None):
+        self.db = db
+        self.projection = projection or PRODUCT_CART_PROJECTION
+        self._cache: Dict[str, Optional[dict]] = {}
+
+    def prime(self, product: dict):
+        """Store an already fetched product document"""
+        self._cache[str(product["_id"])] = product
+
+    async def load(self, product_id: str) -> Optional[dict]:
+        """Load a single product, raising bson InvalidId for malformed ids"""
+        if product_id not in self._cache:
+            product = await self.db.products.find_one(
+                {"_id": ObjectId(product_id)},
+                self.projection
+            )
+            self._cache[product_id] = product
+        return self._cache[product_id]
+
+    async def load_many(self, product_ids: Iterable[str]) -> Dict[str, dict]:
+        """Load many products with a single $in query, skipping invalid ids"""
+        product_ids = list(product_ids)
+        missing: List[ObjectId] = []
+        for product_id in product_ids:
+            if product_id in self._cache or not ObjectId.is_valid(product_id):
+                continue
+            missing.append(ObjectId(product_id))
+
+        if missing:
+            for product_id in missing:
+                self._cache[str(product_id)] = None
+            cursor = self.db.products.find({"_id": {"$in": missing}}, self.projection)
+            async for product in cursor:
+                self.prime(product)
+
+        return {
+            product_id: self._cache[product_id]
+            for product_id in product_ids
+            if self._cache.get(product_id) is not None
+        }
@@ -0,0 +1,101 @@
+import base64
+import binascii
+import math
+from datetime import datetime
+from typing import Any, Optional, Tuple
+from bson import ObjectId, json_util
+from fastapi import HTTPException, status
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Count modes accepted by listing endpoints
+COUNT_MODES = "^(exact|estimated|none)$"
+
+# Sort values a cursor may carry; anything else (documents, arrays, regexes)
+# would be read as a query operator or pattern instead of a position
+CURSOR_VALUE_TYPES = (str, int, float, bool, datetime, type(None))
+
+# Recent counts per (collection, filter shape)
+count_cache = TTLCache(maxsize=1024, ttl=settings.COUNT_CACHE_TTL_SECONDS)
+
+
+def encode_cursor(sort_field: str, document: dict) -> str:
+    """Encode the sort key and _id of the last document in a page"""
+    payload = json_util.dumps({
+        "f": sort_field,
+        "v": document.get(sort_field),
+        "id": document["_id"]
+    })
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str) -> Tuple[Any, Any]:
+    """Decode a cursor into (last sort value, last _id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if payload["f"] != sort_field:
+            raise ValueError("Cursor was issued for a different sort")
+        if not isinstance(payload["id"], ObjectId) or not isinstance(payload["v"], CURSOR_VALUE_TYPES):
+            raise ValueError("Cursor position is not a sort value and id")
+        return payload["v"], payload["id"]
+    except (ValueError, KeyError, TypeError, binascii.Error, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def apply_cursor(query_filter: dict, cursor: Optional[str], sort_field: str, sort_direction: int) -> dict:
+    """Add a keyset range condition continuing after the cursor position"""
+    if not cursor:
+        return query_filter
+    
+    last_value, last_id = decode_cursor(cursor, sort_field)
+    op = "$gt" if sort_direction == 1 else "$lt"
+    range_filter = {"$or": [
+        {sort_field: {op: last_value}},
+        {sort_field: last_value, "_id": {op: last_id}}
+    ]}
+    
+    if not query_filter:
+        return range_filter
+    return {"$and": [query_filter, range_filter]}
+
+
+def next_cursor(documents: list, limit: int, sort_field: str) -> Optional[str]:
+    """Return the cursor for the following page, or None on the last page"""
+    if len(documents) < limit:
+        return None
+    return encode_cursor(sort_field, documents[-1])
+
+
+async def count_documents(collection, query_filter: dict, mode: str = "exact") -> Optional[int]:
+    """Count matching documents according to the requested count mode
+    
+    exact runs count_documents, estimated uses collection metadata for
+    unfiltered queries and a short-lived cached count otherwise, and none
+    skips counting entirely.
+    """
+    if mode == "none":
+        return None
+    
+    if mode == "exact":
+        return await collection.count_documents(query_filter)
+    
+    if not query_filter:
+        return await collection.estimated_document_count()
+    
+    key = (collection.name, json_util.dumps(query_filter))
+    total = count_cache.get(key)
+    if total is None:
+        total = await collection.count_documents(query_filter)
+        count_cache.set(key, total)
+    return total
+
+
+def page_count(total: Optional[int], limit: int) -> Optional[int]:
+    """Return the number of pages, or None when the total was not counted"""
+    if total is None:
+        return None
+    return math.ceil(total / limit)
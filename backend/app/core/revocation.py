@@ -0,0 +1,156 @@
+import asyncio
+import math
+from datetime import datetime
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.core.config import settings
+from app.core.invalidation import subscribe
+
+
+class BloomFilter:
+    """Fixed-size set membership test with false positives but no false negatives"""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.bits = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, digest: bytes):
+        """Derive bit positions from a 16-byte digest by double hashing"""
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, digest: bytes):
+        """Add a digest to the filter"""
+        for position in self._positions(digest):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class RevokedTokens:
+    """Revoked token digests in MongoDB, fronted by an in-process Bloom filter
+    
+    The revoked_tokens collection holds one document per revoked token and a
+    TTL index drops it once the token would have expired anyway. Each worker
+    mirrors the live digests into a Bloom filter, so checking a token that
+    was never revoked needs no query; only filter hits go to MongoDB. The
+    filter is rebuilt every REVOKED_TOKENS_REFRESH_SECONDS, which also drops
+    expired digests, and revocations by other workers are added as the
+    invalidation watcher reports them.
+    """
+
+    def __init__(self):
+        self._filter = self._new_filter(0)
+        # Ids revoked while a rebuild is reading the collection
+        self._rebuild_backlog: Optional[List[str]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.rebuilt_at: Optional[datetime] = None
+        self.checks = 0
+        self.lookups = 0
+        self.false_positives = 0
+
+    def _new_filter(self, count: int) -> BloomFilter:
+        """Return an empty filter with room for the configured capacity"""
+        return BloomFilter(
+            max(settings.REVOKED_TOKENS_CAPACITY, 2 * count),
+            settings.REVOKED_TOKENS_FALSE_POSITIVE_RATE
+        )
+
+    def add(self, token_id: str):
+        """Mirror a revoked token id into the filter"""
+        self._filter.add(bytes.fromhex(token_id))
+        if self._rebuild_backlog is not None:
+            self._rebuild_backlog.append(token_id)
+
+    def observe(self, token_id: str, document: Optional[dict]):
+        """Invalidation listener: add tokens revoked by other workers"""
+        # Deletes come from the TTL index and need no action
+        if document is not None:
+            self.add(token_id)
+
+    async def revoke(self, db, token_id: str, payload: dict):
+        """Store a revoked token until its exp and add it to the filter"""
+        now = datetime.utcnow()
+        try:
+            await db.revoked_tokens.insert_one({
+                "_id": token_id,
+                "user_id": payload.get("sub"),
+                "type": payload.get("type"),
+                "expires_at": datetime.utcfromtimestamp(payload["exp"]),
+                "revoked_at": now,
+                # Read by the invalidation watcher when it falls back to polling
+                "updated_at": now
+            })
+        except DuplicateKeyError:
+            pass
+        self.add(token_id)
+
+    async def is_revoked(self, db, token_id: str) -> bool:
+        """Check a token id, querying MongoDB only when the filter matches"""
+        self.checks += 1
+        if bytes.fromhex(token_id) not in self._filter:
+            return False
+        self.lookups += 1
+        if await db.revoked_tokens.find_one({"_id": token_id}, {"_id": 1}) is not None:
+            return True
+        self.false_positives += 1
+        return False
+
+    async def rebuild(self, db):
+        """Reload every unexpired revoked token into a fresh filter"""
+        query = {"expires_at": {"$gt": datetime.utcnow()}}
+        self._rebuild_backlog = []
+        try:
+            count = await db.revoked_tokens.count_documents(query)
+            bloom = self._new_filter(count)
+            async for document in db.revoked_tokens.find(query, {"_id": 1}):
+                bloom.add(bytes.fromhex(document["_id"]))
+            for token_id in self._rebuild_backlog:
+                bloom.add(bytes.fromhex(token_id))
+            self._filter = bloom
+        finally:
+            self._rebuild_backlog = None
+        self.rebuilt_at = datetime.utcnow()
+
+    def start(self, db):
+        """Rebuild in the background every REVOKED_TOKENS_REFRESH_SECONDS"""
+        self._task = asyncio.create_task(self._rebuild_forever(db))
+
+    async def stop(self):
+        """Cancel the background rebuild"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _rebuild_forever(self, db):
+        """Rebuild the filter periodically, keeping the old one on errors"""
+        while True:
+            await asyncio.sleep(settings.REVOKED_TOKENS_REFRESH_SECONDS)
+            try:
+                await self.rebuild(db)
+            except PyMongoError as e:
+                print(f"Rebuilding revoked token filter failed: {e!r}")
+
+    def stats(self) -> dict:
+        """Return filter size and check counters"""
+        return {
+            "entries": self._filter.count,
+            "bits": self._filter.bits,
+            "hashes": self._filter.hashes,
+            "rebuilt_at": self.rebuilt_at,
+            "checks": self.checks,
+            "lookups": self.lookups,
+            "false_positives": self.false_positives
+        }
+
+
+revoked_tokens = RevokedTokens()
+
+subscribe("revoked_tokens", revoked_tokens.observe)
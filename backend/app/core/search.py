@@ -0,0 +1,555 @@
+import bisect
+import heapq
+import math
+import re
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.core.invalidation import subscribe
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Name matches count more than matches in the body text
+NAME_BOOST = 2
+
+# Fields loaded from Mongo to build the index
+INDEX_PROJECTION = {"name": 1, "description": 1, "category": 1, "specifications": 1, "price": 1, "stock": 1}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def product_terms(product: dict) -> Counter:
+    """Return weighted term frequencies for a product document"""
+    terms = Counter()
+    for token in tokenize(product.get("name") or ""):
+        terms[token] += NAME_BOOST
+    terms.update(tokenize(product.get("description") or ""))
+    terms.update(tokenize(product.get("category") or ""))
+    for value in (product.get("specifications") or {}).values():
+        terms.update(tokenize(str(value)))
+    return terms
+
+
+class SearchIndex:
+    """In-memory inverted index over the product catalog with BM25 scoring"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._categories: Dict[str, Set[str]] = {}
+        self._doc_category: Dict[str, str] = {}
+        self._prices: List[Tuple[float, str]] = []
+        self._doc_price: Dict[str, float] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def clear(self):
+        """Drop every indexed product"""
+        self._postings.clear()
+        self._doc_lengths.clear()
+        self._doc_terms.clear()
+        self._categories.clear()
+        self._doc_category.clear()
+        self._prices.clear()
+        self._doc_price.clear()
+        self._total_length = 0
+
+    def add(self, product: dict):
+        """Index a product, replacing any previous version of it"""
+        doc_id = str(product["_id"])
+        self.remove(doc_id)
+        
+        terms = product_terms(product)
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        
+        category = product.get("category")
+        if category is not None:
+            self._categories.setdefault(category, set()).add(doc_id)
+            self._doc_category[doc_id] = category
+        
+        price = product.get("price")
+        if price is not None:
+            bisect.insort(self._prices, (price, doc_id))
+            self._doc_price[doc_id] = price
+
+    def remove(self, doc_id: str):
+        """Remove a product from the index if present"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        
+        category = self._doc_category.pop(doc_id, None)
+        if category is not None:
+            members = self._categories[category]
+            members.discard(doc_id)
+            if not members:
+                del self._categories[category]
+        
+        price = self._doc_price.pop(doc_id, None)
+        if price is not None:
+            i = bisect.bisect_left(self._prices, (price, doc_id))
+            del self._prices[i]
+
+    def _price_range(self, min_price: Optional[float], max_price: Optional[float]) -> Set[str]:
+        """Return ids whose price falls inside the range"""
+        lo = 0 if min_price is None else bisect.bisect_left(self._prices, (min_price, ""))
+        hi = len(self._prices) if max_price is None else bisect.bisect_right(self._prices, (max_price, "\uffff"))
+        return {doc_id for _, doc_id in self._prices[lo:hi]}
+
+    def filter(
+        self,
+        candidates: Iterable[str],
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float]
+    ) -> Set[str]:
+        """Intersect candidates with the category and price posting lists"""
+        result = set(candidates)
+        if category is not None:
+            result &= self._categories.get(category, set())
+        if min_price is not None or max_price is not None:
+            # Small candidate sets are cheaper to check than to slice the price list
+            if len(result) < 64:
+                result = {
+                    doc_id for doc_id in result
+                    if (min_price is None or self._doc_price.get(doc_id, -math.inf) >= min_price)
+                    and (max_price is None or self._doc_price.get(doc_id, math.inf) <= max_price)
+                }
+            else:
+                result &= self._price_range(min_price, max_price)
+        return result
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """Return (product id, BM25 score) pairs, best match first"""
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        if not terms:
+            return []
+        
+        candidates: Set[str] = set()
+        for term in terms:
+            candidates.update(self._postings[term])
+        candidates = self.filter(candidates, category, min_price, max_price)
+        if not candidates:
+            return []
+        
+        n = len(self._doc_lengths)
+        avg_length = self._total_length / n if n else 0.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self._postings[term]
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            # Walk whichever of the posting list and candidate set is smaller
+            if len(candidates) < len(postings):
+                matches = ((doc_id, postings[doc_id]) for doc_id in candidates if doc_id in postings)
+            else:
+                matches = ((doc_id, tf) for doc_id, tf in postings.items() if doc_id in candidates)
+            for doc_id, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        
+        return top_hits(scores)
+
+
+def top_hits(scores: Dict[str, float], limit: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Return the highest scoring (id, score) pairs, best first"""
+    if limit is not None and limit < len(scores):
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+    return sorted(scores.items(), key=itemgetter(1), reverse=True)
+
+
+def trigrams(word: str) -> Set[str]:
+    """Return the padded character trigrams of a single word"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, giving up once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # Adjacent transpositions count as a single edit
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Character trigram index over the words in product names
+    
+    Misspelled query words are matched against the name vocabulary by
+    trigram overlap, then verified and ranked by edit distance.
+    """
+
+    def __init__(self, min_similarity: float = 0.2, max_candidates: int = 64):
+        self.min_similarity = min_similarity
+        self.max_candidates = max_candidates
+        self.ready = False
+        self._grams: Dict[str, Set[str]] = {}
+        self._words: Dict[str, Set[str]] = {}
+        self._doc_words: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_words)
+
+    def clear(self):
+        """Drop every indexed product"""
+        self._grams.clear()
+        self._words.clear()
+        self._doc_words.clear()
+
+    def add(self, product: dict):
+        """Index a product name, replacing any previous version of it"""
+        doc_id = str(product["_id"])
+        self.remove(doc_id)
+        
+        words = set(tokenize(product.get("name") or ""))
+        self._doc_words[doc_id] = words
+        for word in words:
+            docs = self._words.get(word)
+            if docs is None:
+                docs = self._words[word] = set()
+                for gram in trigrams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+            docs.add(doc_id)
+
+    def remove(self, doc_id: str):
+        """Remove a product from the index if present"""
+        words = self._doc_words.pop(doc_id, None)
+        if words is None:
+            return
+        
+        for word in words:
+            docs = self._words[word]
+            docs.discard(doc_id)
+            if docs:
+                continue
+            # Last product using this word; drop it from the vocabulary
+            del self._words[word]
+            for gram in trigrams(word):
+                grams = self._grams[gram]
+                grams.discard(word)
+                if not grams:
+                    del self._grams[gram]
+
+    def match_words(self, token: str) -> Dict[str, float]:
+        """Return vocabulary words close to token with a 0-1 score"""
+        query_grams = trigrams(token)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._grams.get(gram, ()))
+        
+        max_edits = 1 if len(token) <= 4 else 2
+        matches = {}
+        for word, overlap in shared.most_common(self.max_candidates):
+            similarity = overlap / (len(query_grams) + len(trigrams(word)) - overlap)
+            if similarity < self.min_similarity:
+                break
+            distance = edit_distance(token, word, max_edits)
+            if distance > max_edits:
+                continue
+            matches[word] = (similarity + 1 - distance / max(len(token), len(word))) / 2
+        return matches
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """Return the fuzzy match score of every matching product id"""
+        scores: Dict[str, float] = {}
+        for token in set(tokenize(query)):
+            best: Dict[str, float] = {}
+            for word, score in self.match_words(token).items():
+                for doc_id in self._words[word]:
+                    if score > best.get(doc_id, 0.0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return (product id, score) pairs, best match first"""
+        return top_hits(self.scores(query), limit)
+
+
+class TrieNode:
+    """Radix trie node caching the best completions below it"""
+
+    __slots__ = ("label", "children", "entries", "top")
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.children: Dict[str, "TrieNode"] = {}
+        self.entries: Set[str] = set()
+        self.top: Optional[List[Tuple[float, str]]] = None
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """Return the length of the shared prefix of two strings"""
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class SuggestIndex:
+    """Compact (radix) trie over product names and categories for autocomplete
+    
+    Edges carry whole label strings rather than single characters. Every
+    word start of a name or category is a key, so "pro" completes
+    "iPhone 15 Pro". Each node caches its top-k (weight, key) pairs, where
+    weight is product stock or the summed stock of a category. Inserts are
+    merged into the cached lists along their paths; a delete only clears a
+    cache when the deleted entry was in it.
+    """
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self.ready = False
+        self._root = TrieNode()
+        self._entries: Dict[str, dict] = {}
+        self._category_stock: Dict[str, Dict[str, int]] = {}
+        self._category_totals: Dict[str, int] = {}
+        self._doc_category: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Drop every entry"""
+        self._root = TrieNode()
+        self._entries.clear()
+        self._category_stock.clear()
+        self._category_totals.clear()
+        self._doc_category.clear()
+
+    @staticmethod
+    def _keys(text: str) -> List[str]:
+        """Return the word-start suffixes of text used as trie keys"""
+        words = tokenize(text)
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _offer(self, node: TrieNode, weight: float, key: str):
+        """Merge an entry into a node's cached top-k list"""
+        top = node.top
+        if top is None or any(k == key for _, k in top):
+            return
+        if len(top) < self.k or (weight, key) > top[-1]:
+            top.append((weight, key))
+            top.sort(reverse=True)
+            del top[self.k:]
+
+    def _insert(self, key: str, entry: dict):
+        """Add an entry under each of its keys"""
+        self._entries[key] = entry
+        weight = entry["weight"]
+        for suffix in self._keys(entry["text"]):
+            node = self._root
+            self._offer(node, weight, key)
+            rest = suffix
+            while rest:
+                child = node.children.get(rest[0])
+                if child is None:
+                    # A new leaf holds only this entry; below an uncached
+                    # node (e.g. during a bulk build) it stays lazy too
+                    child = node.children[rest[0]] = TrieNode(rest)
+                    child.top = [] if node.top is not None else None
+                    common = len(rest)
+                else:
+                    common = common_prefix_length(child.label, rest)
+                    if common < len(child.label):
+                        # Split the edge; the new node covers the same subtree
+                        middle = TrieNode(child.label[:common])
+                        middle.top = list(child.top) if child.top is not None else None
+                        child.label = child.label[common:]
+                        middle.children[child.label[0]] = child
+                        node.children[rest[0]] = child = middle
+                node = child
+                self._offer(node, weight, key)
+                rest = rest[common:]
+            node.entries.add(key)
+
+    def _delete(self, key: str):
+        """Remove an entry, pruning and merging nodes left empty"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for suffix in self._keys(entry["text"]):
+            path = [self._root]
+            rest = suffix
+            while rest:
+                child = path[-1].children.get(rest[0])
+                if child is None or not rest.startswith(child.label):
+                    break
+                path.append(child)
+                rest = rest[len(child.label):]
+            else:
+                path[-1].entries.discard(key)
+            for node in path:
+                if node.top is not None and any(k == key for _, k in node.top):
+                    node.top = None
+            for i in range(len(path) - 1, 0, -1):
+                node, parent = path[i], path[i - 1]
+                if node.entries:
+                    break
+                if not node.children:
+                    del parent.children[node.label[0]]
+                    continue
+                if len(node.children) == 1:
+                    # Fold a pass-through node into its only child
+                    (child,) = node.children.values()
+                    child.label = node.label + child.label
+                    parent.children[child.label[0]] = child
+                break
+
+    def _set_category(self, category: str):
+        """Refresh a category entry from the stock of its products"""
+        key = f"c:{category}"
+        self._delete(key)
+        if self._category_stock.get(category):
+            self._insert(key, {
+                "text": category,
+                "type": "category",
+                "product_id": None,
+                "category": category,
+                "weight": self._category_totals[category]
+            })
+
+    def add(self, product: dict):
+        """Add or refresh a product and its category"""
+        doc_id = str(product["_id"])
+        self.remove(doc_id)
+        
+        stock = product.get("stock") or 0
+        category = product.get("category")
+        self._insert(f"p:{doc_id}", {
+            "text": product.get("name") or "",
+            "type": "product",
+            "product_id": doc_id,
+            "category": category,
+            "weight": stock
+        })
+        if category:
+            self._category_stock.setdefault(category, {})[doc_id] = stock
+            self._category_totals[category] = self._category_totals.get(category, 0) + stock
+            self._doc_category[doc_id] = category
+            self._set_category(category)
+
+    def remove(self, doc_id: str):
+        """Remove a product and update its category"""
+        self._delete(f"p:{doc_id}")
+        category = self._doc_category.pop(doc_id, None)
+        if category:
+            products = self._category_stock[category]
+            self._category_totals[category] -= products.pop(doc_id, 0)
+            if not products:
+                del self._category_stock[category]
+                del self._category_totals[category]
+            self._set_category(category)
+
+    def _top(self, node: TrieNode) -> List[Tuple[float, str]]:
+        """Return the cached top-k (weight, key) pairs below a node"""
+        if node.top is None:
+            weights = {key: self._entries[key]["weight"] for key in node.entries}
+            for child in node.children.values():
+                weights.update((key, weight) for weight, key in self._top(child))
+            node.top = heapq.nlargest(self.k, ((weight, key) for key, weight in weights.items()))
+        return node.top
+
+    def warm(self):
+        """Fill every node's top-k cache so first lookups stay fast"""
+        self._top(self._root)
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[dict]:
+        """Return up to limit completions for prefix, heaviest first"""
+        node = self._root
+        rest = " ".join(tokenize(prefix))
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            if rest.startswith(child.label):
+                rest = rest[len(child.label):]
+            elif child.label.startswith(rest):
+                rest = ""
+            else:
+                return []
+            node = child
+        return [self._entries[key] for _, key in self._top(node)[:limit or self.k]]
+
+
+search_index = SearchIndex()
+trigram_index = TrigramIndex()
+suggest_index = SuggestIndex()
+
+
+async def build_indexes(db):
+    """Build every catalog index in one pass over the products collection"""
+    search_index.clear()
+    trigram_index.clear()
+    suggest_index.clear()
+    async for product in db.products.find({}, INDEX_PROJECTION):
+        index_product(product)
+    suggest_index.warm()
+    search_index.ready = True
+    trigram_index.ready = True
+    suggest_index.ready = True
+
+
+def index_product(product: dict):
+    """Add or refresh a product in every catalog index"""
+    search_index.add(product)
+    trigram_index.add(product)
+    suggest_index.add(product)
+
+
+def unindex_product(product_id: str):
+    """Remove a product from every catalog index"""
+    search_index.remove(product_id)
+    trigram_index.remove(product_id)
+    suggest_index.remove(product_id)
+
+
+def on_product_change(product_id: str, product: Optional[dict]):
+    """Keep the indexes in step with product writes made by other workers"""
+    if product is None:
+        unindex_product(product_id)
+    else:
+        index_product(product)
+
+
+subscribe("products", on_product_change)
@@ -1,9 +1,76 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Any, Callable, Optional, Union
 from jose import JWTError, jwt
 import bcrypt
+from app.core.cache import TTLCache
 from app.core.config import settings
 
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so it never blocks the event loop
+    
+    bcrypt releases the GIL while hashing, so threads hash in parallel with
+    request handling. At most `workers` hashes run at once and at most
+    `max_queue` more wait; further calls fail fast with PasswordHasherBusy.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        """Number of calls waiting for a free worker"""
+        return max(0, self.pending - self.workers)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a bcrypt call on the pool"""
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        self.pending += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        """Return pool size, queue depth and call counters"""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": min(self.pending, self.workers),
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
+
+# Verified JWT payloads by token digest
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -14,6 +81,23 @@ def get_password_hash(password: str) -> str:
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash off the event loop"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await password_hasher.run(get_password_hash, password)
+
+def principal_claims(user: dict) -> dict:
+    """Return the access token claims that authorize a user without a lookup"""
+    return {
+        "sub": str(user["_id"]),
+        "active": user.get("is_active", True),
+        "admin": user.get("is_admin", False),
+        "ver": user.get("token_version", 0)
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -22,7 +106,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    # jti keeps tokens issued in the same second distinct, so each can be revoked alone
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -30,14 +115,42 @@ def create_refresh_token(data: dict) -> str:
     """Create JWT refresh token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def decode_token(token: str) -> Optional[dict]:
-    """Decode and verify JWT token"""
+def token_digest(token: str) -> bytes:
+    """Return the digest identifying a token in caches and the revocation store"""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+def token_id(token: str) -> str:
+    """Return the id a revoked token is stored under"""
+    return token_digest(token).hex()
+
+def verify_token(token: str) -> Optional[dict]:
+    """Verify a JWT signature and claims without the cache"""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError:
         return None
+
+def decode_token(token: str) -> Optional[dict]:
+    """Decode and verify JWT token"""
+    # Clients resend the same token on every request, so verified payloads
+    # are cached by token digest until the token's exp; failures are not
+    # cached. Only called from the event loop thread, so get/set cannot race.
+    key = token_digest(token)
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = verify_token(token)
+        if payload is None:
+            return None
+        remaining = payload.get("exp", 0) - time.time()
+        if remaining > 0:
+            token_cache.set(key, payload, min(remaining, token_cache.ttl))
+    elif payload.get("exp", 0) <= time.time():
+        token_cache.delete(key)
+        return None
+    # Callers get their own copy of the shared payload
+    return dict(payload)
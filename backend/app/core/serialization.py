@@ -0,0 +1,83 @@
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type, Union, get_args, get_origin
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+# A field plan entry: (name, default, nested model or None, is list of nested)
+FieldPlan = Tuple[str, Any, Optional[Type[BaseModel]], bool]
+
+
+def default(value: Any) -> Any:
+    """Serialize types orjson does not handle natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes, handling ObjectId, datetime and models"""
+    return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def nested_model(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """Return the model nested in a field annotation and whether it is a list"""
+    if get_origin(annotation) is Union:
+        annotation = next(a for a in get_args(annotation) if a is not type(None))
+    many = get_origin(annotation) in (list, List)
+    if many:
+        annotation = get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, many
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def field_plan(model: Type[BaseModel]) -> Tuple[FieldPlan, ...]:
+    """Precompute how to copy a model's fields out of a document"""
+    plan = []
+    for name, field in model.model_fields.items():
+        value = None if field.default is PydanticUndefined else field.default
+        if field.default_factory is not None:
+            value = field.default_factory()
+        plan.append((name, value) + nested_model(field.annotation))
+    return tuple(plan)
+
+
+def trusted(model: Type[BaseModel], document: dict, fields: Optional[frozenset] = None) -> dict:
+    """Shape a document read from our own database like a model, without validating
+
+    Only the model's fields are copied, so internal fields such as
+    hashed_password never leak; id defaults to the stringified _id.
+    fields restricts the output to a sparse fieldset (id is always kept).
+    """
+    shaped = {}
+    for name, value, nested, many in field_plan(model):
+        if fields is not None and name != "id" and name not in fields:
+            continue
+        value = document.get(name, value)
+        if nested is not None and value is not None:
+            if many:
+                value = [trusted(nested, item) for item in value]
+            elif isinstance(value, dict):
+                value = trusted(nested, value)
+        shaped[name] = value
+    if "id" in shaped and shaped["id"] is None and "_id" in document:
+        shaped["id"] = str(document["_id"])
+    return shaped
+
+
+def trusted_list(model: Type[BaseModel], documents: List[dict], fields: Optional[frozenset] = None) -> List[dict]:
+    """Shape a list of trusted documents like a model"""
+    return [trusted(model, document, fields) for document in documents]
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers asking for the same key
+
+    The first caller starts the call; callers arriving before it finishes
+    await the same task instead of starting their own. The task is shielded,
+    so a cancelled caller does not cancel the call for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the call already running for it"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.calls += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """Forget a finished call and mark its exception as retrieved"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Return started, collapsed and in-flight call counts"""
+        requests = self.calls + self.collapsed
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._calls),
+            "collapse_ratio": self.collapsed / requests if requests else 0.0
+        }
+
+
+# Named groups, reported together by /admin/cache/stats
+flight_groups: Dict[str, SingleFlight] = {}
+
+
+def flight_group(name: str) -> SingleFlight:
+    """Return the single-flight group registered under a name"""
+    return flight_groups.setdefault(name, SingleFlight())
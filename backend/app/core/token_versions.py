@@ -0,0 +1,162 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.core.invalidation import subscribe
+
+
+class TokenVersionTable:
+    """Per-user access token versions, refreshed from MongoDB in bulk
+    
+    Access tokens carry the user's token_version; a token is only accepted
+    while it matches the version held here. Only users whose tokens were
+    revoked at least once, or who are inactive, are stored, so the table
+    stays small. Between bulk refreshes it is kept current by local writes
+    and the "users" invalidation channel. Versions only ever grow, so a
+    refresh that raced a bump never moves a user back. Deleted users leave
+    no user document behind, so deletes are recorded as tombstones in the
+    deleted_users collection, which refreshes read as well.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._inactive: Set[str] = set()
+        # Deleted users, kept until every access token issued to them has expired
+        self._deleted: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshed_at: Optional[datetime] = None
+        self.checks = 0
+        self.rejected = 0
+
+    def version(self, user_id: str) -> int:
+        """Return the version a user's access tokens must carry"""
+        return self._versions.get(user_id, 0)
+
+    def is_current(self, user_id: str, version: int) -> bool:
+        """Check a token's user and version against the table"""
+        self.checks += 1
+        if user_id in self._deleted or user_id in self._inactive or self.version(user_id) != version:
+            self.rejected += 1
+            return False
+        return True
+
+    def set(self, user_id: str, version: int, is_active: bool = True):
+        """Record a user's current version and active flag"""
+        if version > self.version(user_id):
+            self._versions[user_id] = version
+        if is_active:
+            self._inactive.discard(user_id)
+        else:
+            self._inactive.add(user_id)
+
+    def delete(self, user_id: str):
+        """Reject every token of a deleted user"""
+        self._deleted.setdefault(user_id, time.monotonic())
+
+    def observe(self, user_id: str, user: Optional[dict]):
+        """Invalidation listener: apply a user document, or None on delete"""
+        if user is None:
+            self.delete(user_id)
+        else:
+            self.set(user_id, user.get("token_version", 0), user.get("is_active", True))
+
+    def observe_tombstone(self, user_id: str, tombstone: Optional[dict]):
+        """Invalidation listener: reject tokens of a user deleted by another worker"""
+        if tombstone is not None:
+            self.delete(user_id)
+            user_cache.bump(user_id)
+
+    async def refresh(self, db):
+        """Reload every revoked, inactive or deleted user"""
+        versions: Dict[str, int] = {}
+        inactive: Set[str] = set()
+        # Each $or branch is served by a partial index holding only those users
+        async for user in db.users.find(
+            {"$or": [{"token_version": {"$gt": 0}}, {"is_active": False}]},
+            {"token_version": 1, "is_active": 1}
+        ):
+            user_id = str(user["_id"])
+            versions[user_id] = user.get("token_version", 0)
+            if not user.get("is_active", True):
+                inactive.add(user_id)
+        for user_id, version in self._versions.items():
+            versions[user_id] = max(version, versions.get(user_id, 0))
+        self._versions = versions
+        self._inactive = inactive
+        
+        expired = time.monotonic() - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        deleted = {user_id: at for user_id, at in self._deleted.items() if at > expired}
+        async for tombstone in db.deleted_users.find({"expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}):
+            deleted.setdefault(tombstone["_id"], time.monotonic())
+        self._deleted = deleted
+        self.refreshed_at = datetime.utcnow()
+
+    def start(self, db):
+        """Refresh in the background every TOKEN_VERSION_REFRESH_SECONDS"""
+        self._task = asyncio.create_task(self._refresh_forever(db))
+
+    async def stop(self):
+        """Cancel the background refresh"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_forever(self, db):
+        """Refresh the table periodically, keeping the old one on errors"""
+        while True:
+            await asyncio.sleep(settings.TOKEN_VERSION_REFRESH_SECONDS)
+            try:
+                await self.refresh(db)
+            except PyMongoError as e:
+                print(f"Refreshing token versions failed: {e!r}")
+
+    def stats(self) -> dict:
+        """Return table size and check counters"""
+        return {
+            "versions": len(self._versions),
+            "inactive": len(self._inactive),
+            "deleted": len(self._deleted),
+            "refreshed_at": self.refreshed_at,
+            "checks": self.checks,
+            "rejected": self.rejected
+        }
+
+
+token_versions = TokenVersionTable()
+
+subscribe("users", token_versions.observe)
+subscribe("deleted_users", token_versions.observe_tombstone)
+
+
+async def revoke_user_tokens(db, user_id: str, changes: Optional[dict] = None) -> Optional[dict]:
+    """Apply changes to a user and invalidate every token issued before them"""
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$set": {**(changes or {}), "updated_at": datetime.utcnow()}, "$inc": {"token_version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if user is not None:
+        token_versions.set(user_id, user["token_version"], user.get("is_active", True))
+        user_cache.bump(user_id)
+    return user
+
+async def delete_user_tokens(db, user_id: str):
+    """Record a deleted user so every worker rejects its tokens until they expire"""
+    now = datetime.utcnow()
+    # TTL-indexed on expires_at; updated_at is read by the polling watcher
+    await db.deleted_users.update_one(
+        {"_id": user_id},
+        {"$set": {
+            "expires_at": now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+            "updated_at": now
+        }},
+        upsert=True
+    )
+    token_versions.delete(user_id)
+    user_cache.bump(user_id)
@@ -11,6 +11,7 @@ class User(BaseModel):
     phone: Optional[str] = None
     is_active: bool = True
     is_admin: bool = False
+    token_version: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -26,3 +27,9 @@ class User(BaseModel):
                 "is_admin": False
             }
         }
+
+class Principal(BaseModel):
+    """Authorization facts about the caller, as carried by the access token"""
+    id: str
+    is_active: bool = True
+    is_admin: bool = False
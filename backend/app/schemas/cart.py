@@ -1,7 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
+# Most lines accepted by one batch cart update
+MAX_CART_BATCH_ITEMS = 500
+
 class CartItemBase(BaseModel):
     product_id: str
     quantity: int = Field(..., gt=0)
@@ -9,6 +12,9 @@ class CartItemBase(BaseModel):
 class CartItemAdd(CartItemBase):
     pass
 
+class CartBatchAdd(BaseModel):
+    items: List[CartItemAdd] = Field(..., min_length=1, max_length=MAX_CART_BATCH_ITEMS)
+
 class CartItemUpdate(BaseModel):
     quantity: int = Field(..., gt=0)
 
@@ -31,3 +37,12 @@ class CartResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class CartSummary(BaseModel):
+    item_count: int
+    total: float
+    updated_at: Optional[datetime] = None
+
+class CartDelta(CartSummary):
+    product_id: str
+    item: Optional[CartItem] = None
@@ -51,8 +51,25 @@ class OrderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class OrderSummary(BaseModel):
+    id: str
+    user_id: str
+    total: float
+    status: OrderStatus
+    payment_method: str
+    created_at: datetime
+    updated_at: datetime
+
 class OrderList(BaseModel):
     orders: List[OrderResponse]
-    total: int
+    total: Optional[int] = None
+    page: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class OrderSummaryList(BaseModel):
+    orders: List[OrderSummary]
+    total: Optional[int] = None
     page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
@@ -2,6 +2,9 @@ from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
+# Most ids resolved by one batch request
+MAX_BATCH_IDS = 200
+
 class ProductBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=200)
     description: str
@@ -31,8 +34,56 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductSummary(BaseModel):
+    id: str
+    name: str
+    price: float
+    stock: int
+    images: List[str] = []
+
+class CategoryFacet(BaseModel):
+    category: str
+    count: int
+
+class PriceRangeFacet(BaseModel):
+    min: float
+    max: float
+    count: int
+
+class ProductFacets(BaseModel):
+    categories: Optional[List[CategoryFacet]] = None
+    price_ranges: Optional[List[PriceRangeFacet]] = None
+
 class ProductList(BaseModel):
     products: List[ProductResponse]
-    total: int
+    total: Optional[int] = None
     page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    facets: Optional[ProductFacets] = None
+
+class ProductSummaryList(BaseModel):
+    products: List[ProductSummary]
+    total: Optional[int] = None
+    page: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    facets: Optional[ProductFacets] = None
+
+class ProductBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+class ProductBatch(BaseModel):
+    products: List[ProductResponse]
+    missing: List[str]
+    invalid: List[str]
+
+class ProductSuggestion(BaseModel):
+    text: str
+    type: str
+    product_id: Optional[str] = None
+    category: Optional[str] = None
+
+class SuggestionList(BaseModel):
+    query: str
+    suggestions: List[ProductSuggestion]
@@ -16,6 +16,10 @@ class UserUpdate(BaseModel):
     last_name: Optional[str] = None
     phone: Optional[str] = None
 
+class UserStatusUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+
 class UserResponse(UserBase):
     id: str
     is_active: bool
@@ -27,6 +31,7 @@ class UserResponse(UserBase):
 
 class UserList(BaseModel):
     users: List[UserResponse]
-    total: int
+    total: Optional[int] = None
     page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
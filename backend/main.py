@@ -1,22 +1,42 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.search import build_indexes, search_index
+from app.core.invalidation import create_watcher
+from app.core.revocation import revoked_tokens
+from app.core.token_versions import token_versions
+from app.core.security import PasswordHasherBusy
+from app.core.serialization import ORJSONResponse
 from app.api.v1.api import api_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    # Mark before loading so writes made by other workers meanwhile are replayed
+    watcher = create_watcher(get_database())
+    await watcher.mark()
+    await build_indexes(get_database())
+    print(f"Search index built with {len(search_index)} products")
+    await token_versions.refresh(get_database())
+    token_versions.start(get_database())
+    await revoked_tokens.rebuild(get_database())
+    revoked_tokens.start(get_database())
+    watcher.start()
     yield
     # Shutdown
+    await revoked_tokens.stop()
+    await token_versions.stop()
+    await watcher.stop()
     await close_mongo_connection()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -29,6 +49,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Too many authentication requests, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
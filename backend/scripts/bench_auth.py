@@ -0,0 +1,53 @@
+"""
+Auth dependency benchmark
+Measures per-request CPU of get_current_user for a claims-bearing access token:
+verifying the JWT on every call (the old path) against the verified-token cache.
+No database is needed; claims tokens are authorized without a lookup.
+
+    PYTHONPATH=. python scripts/bench_auth.py
+    PYTHONPATH=. BENCH_TOKENS=1000 python scripts/bench_auth.py
+"""
+import asyncio
+import os
+import time
+from bson import ObjectId
+from fastapi.security import HTTPAuthorizationCredentials
+from app.api import deps
+from app.core.security import create_access_token, decode_token, token_cache, verify_token
+
+RUNS = int(os.getenv("BENCH_RUNS", "20000"))
+TOKENS = int(os.getenv("BENCH_TOKENS", "100"))
+
+def credentials_for(count: int) -> list:
+    """Return bearer credentials for distinct users, as login issues them"""
+    return [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=create_access_token({"sub": str(ObjectId()), "active": True, "admin": False, "ver": 0})
+        )
+        for _ in range(count)
+    ]
+
+async def measure(credentials: list) -> float:
+    """Return mean CPU microseconds per authenticated request"""
+    start = time.process_time()
+    for i in range(RUNS):
+        await deps.get_current_user(credentials[i % len(credentials)], db=None)
+    return (time.process_time() - start) / RUNS * 10 ** 6
+
+async def run_benchmark():
+    """Time the auth dependency with and without the token cache"""
+    credentials = credentials_for(TOKENS)
+    print(f"🔑 {TOKENS} distinct tokens, {RUNS} requests each run")
+    
+    deps.decode_token = verify_token
+    before = await measure(credentials)
+    deps.decode_token = decode_token
+    token_cache.clear()
+    after = await measure(credentials)
+    
+    print(f"⏱️  get_current_user: {before:.1f} µs -> {after:.1f} µs per request ({before / after:.1f}x)")
+    print(f"📊 token cache: {token_cache.stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
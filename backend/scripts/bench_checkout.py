@@ -0,0 +1,121 @@
+"""
+Concurrent checkout benchmark
+Races many buyers for the same scarce products and verifies stock never oversells.
+Run against a local replica set, e.g.:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+    PYTHONPATH=. MONGODB_URL="mongodb://localhost:27017/?replicaSet=rs0" python scripts/bench_checkout.py
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from app.api.v1.endpoints.orders import create_order
+from app.models.user import User
+from app.schemas.order import OrderCreate
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = "ecommerce_bench"
+BUYERS = int(os.getenv("BENCH_BUYERS", "500"))
+PRODUCTS = int(os.getenv("BENCH_PRODUCTS", "5"))
+STOCK = int(os.getenv("BENCH_STOCK", "100"))
+
+ORDER = OrderCreate(
+    shipping_address={
+        "full_name": "Bench Buyer",
+        "address_line1": "1 Load Test Way",
+        "city": "Benchville",
+        "state": "CA",
+        "postal_code": "90001",
+        "country": "USA",
+        "phone": "+1000000000"
+    },
+    payment_method="credit_card"
+)
+
+async def checkout(db, user: User):
+    """Run one checkout and return its outcome"""
+    try:
+        await create_order(ORDER, current_user=user, db=db)
+        return "ok"
+    except HTTPException as e:
+        return "rejected" if e.status_code == 400 else f"error {e.status_code}"
+
+async def run_benchmark():
+    """Seed products and carts, then race every buyer at once"""
+    client = AsyncIOMotorClient(MONGODB_URL)
+    await client.drop_database(DATABASE_NAME)
+    db = client[DATABASE_NAME]
+    
+    result = await db.products.insert_many([
+        {
+            "name": f"Bench Product {i}",
+            "description": "Checkout benchmark product",
+            "price": 10.0,
+            "category": "Bench",
+            "stock": STOCK,
+            "images": [],
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        for i in range(PRODUCTS)
+    ])
+    product_ids = [str(pid) for pid in result.inserted_ids]
+    
+    users = []
+    carts = []
+    for i in range(BUYERS):
+        user_id = str(ObjectId())
+        users.append(User(
+            id=user_id,
+            email=f"buyer{i}@bench.example.com",
+            hashed_password="x",
+            first_name="Bench",
+            last_name=str(i)
+        ))
+        # Each buyer wants two different products so partial failures happen
+        carts.append({
+            "user_id": user_id,
+            "items": [
+                {"product_id": product_ids[i % PRODUCTS], "quantity": 1 + i % 3},
+                {"product_id": product_ids[(i + 1) % PRODUCTS], "quantity": 1}
+            ],
+            "updated_at": datetime.utcnow()
+        })
+    await db.carts.insert_many(carts)
+    
+    print(f"🏁 Racing {BUYERS} buyers for {PRODUCTS} products with stock {STOCK} each...")
+    start = time.perf_counter()
+    results = await asyncio.gather(*(checkout(db, user) for user in users), return_exceptions=True)
+    outcomes = [result if isinstance(result, str) else repr(result) for result in results]
+    elapsed = time.perf_counter() - start
+    
+    # Verify no stock was oversold or lost
+    sold = {pid: 0 for pid in product_ids}
+    async for order in db.orders.find({}):
+        for item in order["items"]:
+            sold[item["product_id"]] += item["quantity"]
+    
+    consistent = True
+    async for product in db.products.find({}):
+        pid = str(product["_id"])
+        if product["stock"] < 0 or product["stock"] + sold[pid] != STOCK or product.get("reservations"):
+            consistent = False
+            print(f"❌ {product['name']}: stock={product['stock']} sold={sold[pid]}")
+    
+    summary = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+    print(f"⏱️  {elapsed:.2f}s total, {BUYERS / elapsed:.0f} checkouts/s")
+    print(f"📊 Outcomes: {summary}")
+    print("✅ Stock is consistent" if consistent else "❌ Stock is inconsistent")
+    
+    await client.drop_database(DATABASE_NAME)
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,58 @@
+"""
+Fuzzy search benchmark
+Builds the trigram index over synthetic product names and times misspelled queries
+fetching the first page of 20 results.
+
+    PYTHONPATH=. python scripts/bench_fuzzy_search.py            # 100k and 1M products
+    PYTHONPATH=. BENCH_SIZES=100000 python scripts/bench_fuzzy_search.py
+"""
+import os
+import random
+import statistics
+import time
+from bson import ObjectId
+from app.core.search import TrigramIndex
+
+SIZES = [int(size) for size in os.getenv("BENCH_SIZES", "100000,1000000").split(",")]
+RUNS = int(os.getenv("BENCH_RUNS", "200"))
+
+BRANDS = ["Apple", "Samsung", "Sony", "Nike", "Adidas", "Dyson", "Canon", "Levi's", "Lenovo", "Bose",
+          "Philips", "Logitech", "Garmin", "Nespresso", "Instant", "Hydro", "Ray-Ban", "Asus", "Dell", "LG"]
+NOUNS = ["iPhone", "Galaxy", "Headphones", "Sneakers", "Hoodie", "Vacuum", "Camera", "Jeans", "Laptop",
+         "Speaker", "Monitor", "Keyboard", "Watch", "Espresso", "Cooker", "Bottle", "Sunglasses", "Tablet",
+         "Router", "Backpack", "Blender", "Charger", "Mouse", "Jacket", "Tripod"]
+QUERIES = ["iphnoe", "samsnug galxy", "headphnes", "snekers nike", "vacum dyson", "logitec mosue", "sunglases"]
+
+def synthetic_name(rng: random.Random) -> str:
+    """Return a plausible product name"""
+    return f"{rng.choice(BRANDS)} {rng.choice(NOUNS)} {rng.choice(['Pro', 'Max', 'Mini', 'Lite', 'Plus'])} {rng.randint(1, 9999)}"
+
+def run_benchmark(size: int):
+    """Build an index of the given size and report query latency"""
+    rng = random.Random(size)
+    index = TrigramIndex()
+    
+    start = time.perf_counter()
+    for _ in range(size):
+        index.add({"_id": ObjectId(), "name": synthetic_name(rng)})
+    build_time = time.perf_counter() - start
+    
+    timings = []
+    for i in range(RUNS):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        index.search(query, limit=20)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    
+    print(f"📦 {size:>9,} products: built in {build_time:.1f}s")
+    print(f"   ⏱️  p50 {statistics.median(timings):.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms, max {timings[-1]:.2f} ms")
+    for query in QUERIES[:3]:
+        scores = index.scores(query)
+        top = max(scores.values(), default=0.0)
+        print(f"   🔎 {query!r}: {len(scores):,} matches, top score {top:.2f}")
+
+if __name__ == "__main__":
+    for size in SIZES:
+        run_benchmark(size)
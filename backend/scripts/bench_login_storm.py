@@ -0,0 +1,70 @@
+"""
+Login storm benchmark
+Measures how a burst of concurrent logins affects unrelated requests on the
+same event loop: bcrypt called inline (the old path) against bcrypt on the
+bounded password hashing pool. A ticker stands in for catalog requests and
+records how late each tick is scheduled.
+
+    PYTHONPATH=. python scripts/bench_login_storm.py
+    PYTHONPATH=. BENCH_LOGINS=64 BENCH_ROUNDS=12 python scripts/bench_login_storm.py
+"""
+import asyncio
+import os
+import statistics
+import time
+import bcrypt
+from app.core.security import password_hasher, verify_password, verify_password_async
+
+LOGINS = int(os.getenv("BENCH_LOGINS", "32"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "10"))
+TICK_SECONDS = 0.005
+
+PASSWORD = "correct horse battery staple"
+HASHED = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=ROUNDS)).decode("utf-8")
+
+async def inline_login():
+    """Verify on the event loop thread"""
+    verify_password(PASSWORD, HASHED)
+
+async def pooled_login():
+    """Verify on the password hashing pool"""
+    await verify_password_async(PASSWORD, HASHED)
+
+async def ticker(stop: asyncio.Event, delays: list):
+    """Sleep for one tick at a time and record how late each wake-up is"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        delays.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+async def storm(login) -> tuple:
+    """Run LOGINS concurrent logins next to the ticker"""
+    stop, delays = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, delays))
+    await asyncio.sleep(TICK_SECONDS * 4)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    return elapsed, delays
+
+def percentile(values: list, fraction: float) -> float:
+    """Return the value at a fraction of the sorted list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run_benchmark():
+    """Compare inline and pooled bcrypt under a login burst"""
+    print(f"🔐 {LOGINS} concurrent logins, bcrypt cost {ROUNDS}, {password_hasher.workers} pool workers, {os.cpu_count()} CPUs")
+    for name, login in (("inline", inline_login), ("pooled", pooled_login)):
+        elapsed, delays = await storm(login)
+        print(
+            f"⏱️  {name}: storm {elapsed * 1000:.0f} ms, {len(delays)} ticks, "
+            f"tick lag p50 {statistics.median(delays):.1f} ms / p99 {percentile(delays, 0.99):.1f} ms / "
+            f"max {max(delays):.1f} ms"
+        )
+    print(f"📊 pool: {password_hasher.stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
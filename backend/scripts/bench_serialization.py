@@ -0,0 +1,124 @@
+"""
+Serialization benchmark
+Measures per-request CPU to turn one page of product and order documents into
+JSON: the old path (build models by hand, then FastAPI validates and encodes the
+response_model again) against trusted shaping rendered with orjson.
+
+    PYTHONPATH=. python scripts/bench_serialization.py
+    PYTHONPATH=. BENCH_PAGE=20 python scripts/bench_serialization.py
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core.serialization import ORJSONResponse, trusted_list
+from app.schemas.order import OrderList, OrderResponse
+from app.schemas.product import ProductList, ProductResponse
+
+PAGE = int(os.getenv("BENCH_PAGE", "100"))
+RUNS = int(os.getenv("BENCH_RUNS", "500"))
+
+def synthetic_product(rng: random.Random) -> dict:
+    """Return a product document as stored by the API"""
+    created = datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, 10 ** 7))
+    return {
+        "_id": ObjectId(),
+        "name": f"Product {rng.randint(1, 10 ** 6)}",
+        "description": "A reasonably long product description " * 8,
+        "price": round(rng.uniform(1, 2000), 2),
+        "category": rng.choice(["Electronics", "Clothing", "Books", "Home"]),
+        "stock": rng.randint(0, 500),
+        "images": [f"https://cdn.example.com/{rng.randint(1, 10 ** 6)}.jpg" for _ in range(3)],
+        "specifications": {"weight": "1kg", "color": "black", "warranty": "2 years"},
+        "created_at": created,
+        "updated_at": created
+    }
+
+def synthetic_order(rng: random.Random) -> dict:
+    """Return an order document as stored by checkout"""
+    items = []
+    for _ in range(rng.randint(1, 5)):
+        quantity, price = rng.randint(1, 3), round(rng.uniform(1, 500), 2)
+        items.append({
+            "id": str(ObjectId()),
+            "product_id": str(ObjectId()),
+            "product_name": f"Product {rng.randint(1, 10 ** 6)}",
+            "quantity": quantity,
+            "price": price,
+            "subtotal": quantity * price
+        })
+    return {
+        "_id": ObjectId(),
+        "user_id": str(ObjectId()),
+        "items": items,
+        "total": sum(item["subtotal"] for item in items),
+        "status": "pending",
+        "shipping_address": {
+            "full_name": "Jane Doe", "address_line1": "1 Main St", "address_line2": None,
+            "city": "Springfield", "state": "IL", "postal_code": "62701",
+            "country": "US", "phone": "+1 555 0100"
+        },
+        "payment_method": "card",
+        "created_at": datetime(2024, 1, 1),
+        "updated_at": datetime(2024, 1, 1)
+    }
+
+async def old_products(field, products: list) -> bytes:
+    """Validate into models by hand, then let FastAPI validate and encode again"""
+    for product in products:
+        product["id"] = str(product["_id"])
+    content = ProductList(products=[ProductResponse(**p) for p in products], total=PAGE, page=1, pages=1)
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+async def old_orders(field, orders: list) -> bytes:
+    """Validate orders by hand, then let FastAPI validate and encode again"""
+    for order in orders:
+        order["id"] = str(order["_id"])
+    content = OrderList(orders=[OrderResponse(**o) for o in orders], total=PAGE, page=1, pages=1)
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+async def new_products(field, products: list) -> bytes:
+    """Shape trusted documents and render with orjson"""
+    return ORJSONResponse({
+        "products": trusted_list(ProductResponse, products),
+        "total": PAGE, "page": 1, "pages": 1, "next_cursor": None, "facets": None
+    }).body
+
+async def new_orders(field, orders: list) -> bytes:
+    """Shape trusted orders and render with orjson"""
+    return ORJSONResponse({
+        "orders": trusted_list(OrderResponse, orders),
+        "total": PAGE, "page": 1, "pages": 1, "next_cursor": None
+    }).body
+
+async def measure(render, field, documents: list) -> float:
+    """Return mean CPU milliseconds per rendered page"""
+    start = time.process_time()
+    for _ in range(RUNS):
+        await render(field, documents)
+    return (time.process_time() - start) / RUNS * 1000
+
+async def run_benchmark():
+    """Time both paths for a page of products and a page of orders"""
+    rng = random.Random(42)
+    products = [synthetic_product(rng) for _ in range(PAGE)]
+    orders = [synthetic_order(rng) for _ in range(PAGE)]
+    product_field = create_response_field(name="Response_products", type_=ProductList, mode="serialization")
+    order_field = create_response_field(name="Response_orders", type_=OrderList, mode="serialization")
+
+    print(f"📦 Page of {PAGE} documents, {RUNS} runs each")
+    for name, old, new, field, documents in (
+        ("ProductList", old_products, new_products, product_field, products),
+        ("OrderList", old_orders, new_orders, order_field, orders)
+    ):
+        before = await measure(old, field, documents)
+        after = await measure(new, field, documents)
+        print(f"⏱️  {name}: {before:.2f} ms -> {after:.2f} ms per request ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,69 @@
+"""
+Autocomplete benchmark
+Builds the suggest trie over synthetic products and measures per-keystroke latency.
+Target: p99 under 1 ms.
+
+    PYTHONPATH=. python scripts/bench_suggest.py
+    PYTHONPATH=. BENCH_SIZE=1000000 python scripts/bench_suggest.py
+"""
+import os
+import random
+import time
+from bson import ObjectId
+from app.core.search import SuggestIndex
+
+SIZE = int(os.getenv("BENCH_SIZE", "100000"))
+RUNS = int(os.getenv("BENCH_RUNS", "20000"))
+WRITES = int(os.getenv("BENCH_WRITES", "1000"))
+
+CATEGORIES = ["Electronics", "Clothing", "Books", "Home", "Sports", "Toys", "Beauty", "Garden"]
+WORDS = ["apple", "iphone", "samsung", "galaxy", "sony", "headphones", "nike", "air", "max", "levis",
+         "jeans", "hoodie", "instant", "pot", "dyson", "vacuum", "yoga", "mat", "dumbbells", "bottle",
+         "camera", "watch", "laptop", "speaker", "monitor", "keyboard", "mouse", "charger", "jacket"]
+
+def percentile(timings: list, pct: float) -> float:
+    """Return a percentile of sorted timings"""
+    return timings[min(len(timings) - 1, int(len(timings) * pct))]
+
+def synthetic_product(rng: random.Random) -> dict:
+    """Return a product document with a random name, category and stock"""
+    return {
+        "_id": ObjectId(),
+        "name": " ".join(rng.sample(WORDS, 3)).title() + f" {rng.randint(1, 999)}",
+        "category": rng.choice(CATEGORIES),
+        "stock": rng.randint(0, 500)
+    }
+
+def run_benchmark():
+    """Build the trie, then time keystroke lookups interleaved with admin writes"""
+    rng = random.Random(42)
+    index = SuggestIndex()
+    products = [synthetic_product(rng) for _ in range(SIZE)]
+    
+    start = time.perf_counter()
+    for product in products:
+        index.add(product)
+    index.warm()
+    print(f"📦 {SIZE:,} products indexed in {time.perf_counter() - start:.1f}s")
+    
+    # Every prefix of every word, as typed one keystroke at a time
+    prefixes = [word[:i] for word in WORDS for i in range(1, len(word) + 1)]
+    write_every = max(1, RUNS // WRITES) if WRITES else 0
+    timings = []
+    for i in range(RUNS):
+        if write_every and i % write_every == 0:
+            product = rng.choice(products)
+            product["stock"] = rng.randint(0, 500)
+            index.add(product)
+        prefix = rng.choice(prefixes)
+        start = time.perf_counter()
+        index.suggest(prefix)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    
+    print(f"⏱️  {RUNS:,} lookups with {WRITES:,} interleaved writes")
+    print(f"   p50 {percentile(timings, 0.5):.3f} ms, p99 {percentile(timings, 0.99):.3f} ms, max {timings[-1]:.3f} ms")
+    print("✅ p99 under 1 ms" if percentile(timings, 0.99) < 1 else "❌ p99 over 1 ms")
+
+if __name__ == "__main__":
+    run_benchmark()
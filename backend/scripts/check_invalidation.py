@@ -0,0 +1,87 @@
+"""
+Cross-worker invalidation check
+Runs the invalidation watcher against a scratch database, writes through a
+separate client (standing in for another worker) and verifies every write is
+broadcast. Use a single-node replica set for change streams:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+    PYTHONPATH=. MONGODB_URL="mongodb://localhost:27017/?replicaSet=rs0" python scripts/check_invalidation.py
+
+Set CHANGE_STREAMS_ENABLED=False to exercise the updated_at polling fallback.
+"""
+import asyncio
+import os
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from app.core.config import settings
+from app.core.invalidation import InvalidationWatcher, PRODUCT_TOMBSTONE_TTL, USER_PIPELINE, record_deletion, subscribe
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = "ecommerce_invalidation_check"
+
+async def wait_for(events: list, expected: tuple, timeout: float):
+    """Wait until an expected (collection, id, deleted) event has been received"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while expected not in events:
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+async def run_check():
+    """Write from one client and watch the broadcast arrive on another"""
+    watcher_client = AsyncIOMotorClient(MONGODB_URL)
+    writer_client = AsyncIOMotorClient(MONGODB_URL)
+    await writer_client.drop_database(DATABASE_NAME)
+    writer = writer_client[DATABASE_NAME]
+    
+    events = []
+    subscribe("products", lambda doc_id, doc: events.append(("products", doc_id, doc is None)))
+    subscribe("users", lambda doc_id, doc: events.append(("users", doc_id, doc is None)))
+    
+    # Writes between mark() and start() stand in for those made during startup
+    watcher = InvalidationWatcher(watcher_client[DATABASE_NAME], {"products": [], "users": USER_PIPELINE})
+    await watcher.mark()
+    product = {"name": "Check Product", "price": 1.0, "stock": 1, "updated_at": datetime.utcnow()}
+    product_id = str((await writer.products.insert_one(product)).inserted_id)
+    watcher.start()
+    await asyncio.sleep(1)
+    timeout = settings.CACHE_INVALIDATION_POLL_SECONDS * 3 + 2
+    
+    user = {"email": "check@example.com", "is_active": True, "is_admin": False, "updated_at": datetime.utcnow()}
+    user_id = str((await writer.users.insert_one(user)).inserted_id)
+    results = {"product insert before start": await wait_for(events, ("products", product_id, False), timeout)}
+    
+    events.clear()
+    await writer.products.update_one(
+        {"_id": product["_id"]},
+        {"$set": {"price": 2.0, "updated_at": datetime.utcnow()}}
+    )
+    results["product update"] = await wait_for(events, ("products", product_id, False), timeout)
+    
+    events.clear()
+    await writer.users.update_one(
+        {"_id": user["_id"]},
+        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+    )
+    results["user deactivation"] = await wait_for(events, ("users", user_id, False), timeout)
+    
+    events.clear()
+    await writer.products.delete_one({"_id": product["_id"]})
+    await record_deletion(writer, "products", product_id, PRODUCT_TOMBSTONE_TTL)
+    results["product delete"] = await wait_for(events, ("products", product_id, True), timeout)
+    
+    print(f"🔭 Watcher mode: {watcher.mode}")
+    for name, ok in results.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    
+    await watcher.stop()
+    await writer_client.drop_database(DATABASE_NAME)
+    watcher_client.close()
+    writer_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_check())
@@ -34,21 +34,40 @@ async def init_database():
     
     # Users indexes
     await db.users.create_index("email", unique=True)
-    await db.users.create_index("created_at")
+    await db.users.create_index([("created_at", -1), ("_id", -1)])
+    # Token version refreshes read only revoked or inactive users
+    await db.users.create_index("token_version", partialFilterExpression={"token_version": {"$gt": 0}})
+    await db.users.create_index("is_active", partialFilterExpression={"is_active": False})
+    # Read by the invalidation watcher when it falls back to polling
+    await db.users.create_index("updated_at")
     
     # Products indexes
     await db.products.create_index("category")
-    await db.products.create_index("price")
+    await db.products.create_index([("price", 1), ("_id", 1)])
     await db.products.create_index([("name", "text"), ("description", "text")])
-    await db.products.create_index("created_at")
+    await db.products.create_index([("name", 1), ("_id", 1)])
+    await db.products.create_index([("created_at", 1), ("_id", 1)])
+    await db.products.create_index("updated_at")
+    
+    # Product tombstones let polling workers see deletes, then expire
+    await db.deleted_products.create_index("expires_at", expireAfterSeconds=0)
+    await db.deleted_products.create_index("updated_at")
     
     # Carts indexes
     await db.carts.create_index("user_id", unique=True)
     
+    # Deleted-user tombstones outlive the users' access tokens, then expire
+    await db.deleted_users.create_index("expires_at", expireAfterSeconds=0)
+    await db.deleted_users.create_index("updated_at")
+    
+    # Revoked tokens expire with the tokens themselves
+    await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.revoked_tokens.create_index("updated_at")
+    
     # Orders indexes
-    await db.orders.create_index("user_id")
+    await db.orders.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
     await db.orders.create_index("status")
-    await db.orders.create_index("created_at")
+    await db.orders.create_index([("created_at", -1), ("_id", -1)])
     
     print("✅ Indexes created successfully!")
     
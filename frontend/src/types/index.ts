@@ -22,6 +22,12 @@ export interface Product {
   updated_at: string;
 }
 
+export interface ProductBatch {
+  products: Product[];
+  missing: string[];
+  invalid: string[];
+}
+
 export interface CartItem {
   id: string;
   product_id: string;
@@ -40,6 +46,17 @@ export interface Cart {
   updated_at: string;
 }
 
+export interface CartSummary {
+  item_count: number;
+  total: number;
+  updated_at: string | null;
+}
+
+export interface CartDelta extends CartSummary {
+  product_id: string;
+  item: CartItem | null;
+}
+
 export interface ShippingAddress {
   full_name: string;
   address_line1: string;
@@ -74,7 +91,8 @@ export interface Order {
 
 export interface PaginatedResponse<T> {
   items: T[];
-  total: number;
+  total: number | null;
   page: number;
-  pages: number;
+  pages: number | null;
+  next_cursor?: string | null;
 }